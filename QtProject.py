@@ -1,200 +1,332 @@
 import sys
-import io
 import datetime as dt
-import csv
 import os
-import math
-import sqlite3  
-from tkinter import ttk
-from PyQt6 import QtWidgets, uic
+import collections
+import threading
+import time
+from PyQt6 import QtWidgets
 from PyQt6 import QtCore
 from PyQt6 import QtGui
 from PyQt6.QtCore import QDateTime, QTimer, Qt
-from PyQt6.QtWidgets import QApplication, QMainWindow, QListWidgetItem, QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QListWidget, QComboBox
-from PyQt6.QtGui import QTextCursor, QTextCharFormat
+from PyQt6.QtWidgets import QApplication, QMainWindow, QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QListView, QComboBox
 
+from budget_core import (
+    BalanceIndex, BudgetMap, SpendingForecaster, Spending, SpendingRangeCache, SpendingStore, StatisticsEngine,
+    VersionedCache, SPENDING_STATUSES, day_balance, day_heat, ostatok_status,
+)
 
-class DatabaseManager:
-    def __init__(self, db_path='budget_data.db'):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS budget_maps (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                total_budget REAL NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                initial_balance REAL NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS budget_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                budget_map_id INTEGER NOT NULL,
-                item_name TEXT NOT NULL,
-                item_amount REAL NOT NULL,
-                FOREIGN KEY (budget_map_id) REFERENCES budget_maps (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_spendings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                item_name TEXT NOT NULL,
-                amount REAL NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+
+class PersistenceWorker(QtCore.QThread):
+    saved = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+    budget_map_saved = QtCore.pyqtSignal(object, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = collections.OrderedDict()
+        self.condition = threading.Condition()
+        self.busy = False
+        self.stopping = False
+
+    def submit(self, key, job):
+        with self.condition:
+            if self.stopping:
+                raise RuntimeError("Сохранение уже остановлено")
+            self.pending[key] = job
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                key, job = self.pending.popitem(last=False)
+                self.busy = True
+            
+            try:
+                self.saved.emit(job())
+            except Exception as e:
+                print(f"Ошибка фонового сохранения {key}: {e}")
+                self.failed.emit(str(e))
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def flush(self):
+        with self.condition:
+            while self.pending or self.busy:
+                if not self.isRunning():
+                    break
+                self.condition.wait(0.1)
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.wait()
+
+
+class RowListModel(QtCore.QAbstractListModel):
+    def __init__(self, rows=None, format_row=None, parent=None):
+        super().__init__(parent)
+        self.rows = list(rows or [])
+        self.format_row = format_row
+        self.colors = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
         
-        conn.commit()
-        conn.close()
+        row = self.rows[index.row()]
+        if self.format_row:
+            row = self.format_row(row)
+        text, background, foreground = row
+        if role == Qt.ItemDataRole.DisplayRole:
+            return text
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return self.color(background)
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return self.color(foreground)
+        return None
+
+    def color(self, rgb):
+        if rgb is None:
+            return None
+        color = self.colors.get(rgb)
+        if color is None:
+            color = self.colors[rgb] = QtGui.QColor(*rgb)
+        return color
+
+    def set_rows(self, rows):
+        rows = list(rows)
+        old_count = len(self.rows)
+        new_count = len(rows)
+        
+        if new_count < old_count:
+            self.beginRemoveRows(QtCore.QModelIndex(), new_count, old_count - 1)
+            del self.rows[new_count:]
+            self.endRemoveRows()
+        
+        common = min(old_count, new_count)
+        changed = [row for row in range(common) if self.rows[row] != rows[row]]
+        if changed:
+            self.rows[:common] = rows[:common]
+            self.dataChanged.emit(self.index(changed[0]), self.index(changed[-1]))
+        
+        if new_count > old_count:
+            self.beginInsertRows(QtCore.QModelIndex(), old_count, new_count - 1)
+            self.rows.extend(rows[old_count:])
+            self.endInsertRows()
+
+    def append_row(self, row):
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows))
+        self.rows.append(row)
+        self.endInsertRows()
+
+    def clear(self):
+        self.set_rows([])
+
+
+def create_list_view(model, list_view=None):
+    list_view = list_view or QListView()
+    list_view.setUniformItemSizes(True)
+    list_view.setModel(model)
+    return list_view
+
+
+class BudgetCalendarWidget(QtWidgets.QCalendarWidget):
+    PERIOD_COLOR = (173, 216, 230)
+    HEAT_COLORS = {
+        'low': (198, 239, 206),
+        'medium': (255, 235, 156),
+        'high': (255, 199, 128),
+        'over': (255, 150, 150),
+    }
+    OVERSPEND_MARKER_COLOR = (200, 0, 0)
+    HEAT_MONTHS = 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.period = None
+        self.period_color = QtGui.QColor(*self.PERIOD_COLOR)
+        self.heat_colors = {level: QtGui.QColor(*color) for level, color in self.HEAT_COLORS.items()}
+        self.month_heat = collections.OrderedDict()
+
+    def set_period(self, start_date=None, end_date=None):
+        self.period = (start_date, end_date) if start_date and end_date else None
+        self.updateCells()
+
+    def heat_cell(self, heat):
+        return self.heat_colors[heat.level], heat.level == 'over'
+
+    def set_month_heat(self, year, month, heat):
+        self.month_heat[year, month] = {date: self.heat_cell(day_heat) for date, day_heat in heat.items()}
+        self.month_heat.move_to_end((year, month))
+        if len(self.month_heat) > self.HEAT_MONTHS:
+            self.month_heat.popitem(last=False)
+        self.updateCells()
+
+    def day_heat(self, date):
+        cells = self.month_heat.get((date.year, date.month))
+        return cells.get(date) if cells else None
+
+    def update_day(self, date, heat):
+        cells = self.month_heat.get((date.year, date.month))
+        if cells is not None:
+            if heat:
+                cells[date] = self.heat_cell(heat)
+            else:
+                cells.pop(date, None)
+        self.updateCell(QtCore.QDate(date.year, date.month, date.day))
+
+    def clear_heat(self):
+        self.month_heat.clear()
+        self.updateCells()
+
+    def paintCell(self, painter, rect, date):
+        super().paintCell(painter, rect, date)
+        
+        date = date.toPyDate()
+        cell = self.day_heat(date)
+        if cell:
+            color, overspent = cell
+        elif self.period and self.period[0] <= date <= self.period[1]:
+            color, overspent = self.period_color, False
+        else:
+            return
+        
+        painter.save()
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Multiply)
+        painter.fillRect(rect, color)
+        if overspent:
+            marker = max(4, rect.height() // 5)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_SourceOver)
+            painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QtGui.QColor(*self.OVERSPEND_MARKER_COLOR))
+            painter.drawEllipse(rect.right() - marker - 1, rect.top() + 2, marker, marker)
+        painter.restore()
+
+
+def benchmark_calendar(period_days=30):
+    import contextlib
+    import io
+    import tempfile
+    from PyQt6.QtGui import QTextCharFormat
+    from budget_core.storage import DatabaseManager
     
-    def clear_all_data(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM budget_maps')
-        cursor.execute('DELETE FROM budget_items')
-        cursor.execute('DELETE FROM daily_spendings')
-        conn.commit()
-        conn.close()
-        print("Все данные очищены из БД")
+    start_date = dt.date.today()
+    end_date = start_date + dt.timedelta(days=period_days)
     
-    def save_budget_map(self, budget_data):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO budget_maps (total_budget, start_date, end_date, initial_balance)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            budget_data['total_budget'],
-            budget_data['start_date'].strftime('%Y-%m-%d'),
-            budget_data['end_date'].strftime('%Y-%m-%d'),
-            budget_data['initial_ostatok']
-        ))
-        
-        budget_map_id = cursor.lastrowid
-        
-        for item_name, item_amount in budget_data['items']:
-            cursor.execute('''
-                INSERT INTO budget_items (budget_map_id, item_name, item_amount)
-                VALUES (?, ?, ?)
-            ''', (budget_map_id, item_name, item_amount))
-        
-        conn.commit()
-        conn.close()
-        return budget_map_id
+    legacy_calendar = QtWidgets.QCalendarWidget()
+    started = time.perf_counter()
+    highlight_format = QTextCharFormat()
+    highlight_format.setBackground(QtGui.QColor(*BudgetCalendarWidget.PERIOD_COLOR))
+    current_date = legacy_calendar.minimumDate()
+    end_calendar = legacy_calendar.maximumDate()
+    while current_date <= end_calendar:
+        legacy_calendar.setDateTextFormat(current_date, QTextCharFormat())
+        current_date = current_date.addDays(1)
+    current_date = start_date
+    while current_date <= end_date:
+        legacy_calendar.setDateTextFormat(QtCore.QDate(current_date.year, current_date.month, current_date.day),
+                                          highlight_format)
+        current_date += dt.timedelta(days=1)
+    legacy = time.perf_counter() - started
     
-    def get_latest_budget_map(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, total_budget, start_date, end_date, initial_balance 
-            FROM budget_maps 
-            ORDER BY created_date DESC LIMIT 1
-        ''')
-        
-        budget_row = cursor.fetchone()
-        if not budget_row:
-            conn.close()
-            return None
-        
-        budget_id, total_budget, start_date, end_date, initial_balance = budget_row
-        
-        cursor.execute('''
-            SELECT item_name, item_amount 
-            FROM budget_items 
-            WHERE budget_map_id = ?
-        ''', (budget_id,))
-        
-        items = cursor.fetchall()
-        conn.close()
-        
-        return {
-            'items': items,
-            'total_budget': total_budget,
-            'start_date': dt.datetime.strptime(start_date, '%Y-%m-%d').date(),
-            'end_date': dt.datetime.strptime(end_date, '%Y-%m-%d').date(),
-            'initial_ostatok': initial_balance,
-            'actual_ostatok': total_budget
-        }
+    calendar = BudgetCalendarWidget()
+    started = time.perf_counter()
+    calendar.set_period(start_date, end_date)
+    calendar.grab()
+    painted = time.perf_counter() - started
     
-    def save_daily_spendings(self, date, spendings):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        date_str = date.strftime('%Y-%m-%d')
-        
-        cursor.execute('DELETE FROM daily_spendings WHERE date = ?', (date_str,))
-        
-        for spending in spendings:
-            cursor.execute('''
-                INSERT INTO daily_spendings (date, item_name, amount)
-                VALUES (?, ?, ?)
-            ''', (date_str, spending['item_name'], spending['summa']))
-        
-        conn.commit()
-        conn.close()
-        print(f"Сохранено {len(spendings)} трат за {date_str}")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                db_manager = DatabaseManager()
+                db_manager.save_budget_map(BudgetMap([('Пункт', 1000)], 1000, start_date, end_date, 0))
+                db_manager.close()
+                started = time.perf_counter()
+                planner = CartSpenndings()
+                planner.load_history()
+                startup = time.perf_counter() - started
+                planner.shutdown()
+        finally:
+            os.chdir(cwd)
     
-    def get_all_daily_spendings(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT date, item_name, amount 
-            FROM daily_spendings 
-            ORDER BY date
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        daily_spendings = {}
-        for date_str, item_name, amount in rows:
-            if date_str not in daily_spendings:
-                daily_spendings[date_str] = []
-            
-            daily_spendings[date_str].append({
-                'item_name': item_name,
-                'summa': amount,
-                'display_text': f"{item_name} (бюджет: ... руб.)"
-            })
-        
-        return daily_spendings
+    print(f"{'setDateTextFormat':>18}: {legacy * 1000:.1f} мс")
+    print(f"{'paintCell':>18}: {painted * 1000:.1f} мс")
+    print(f"Ускорение: x{legacy / painted:.0f}")
+    print(f"Запуск окна с подсветкой периода: {startup * 1000:.1f} мс (раньше ещё +{legacy * 1000:.0f} мс)")
+
+
+def benchmark_startup(runs=7, days=30, spendings_count=30000):
+    import contextlib
+    import io
+    import subprocess
+    import tempfile
+    from budget_core.storage import DatabaseManager
     
-    def get_spendings_by_date_range(self, start_date, end_date):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT date, item_name, amount 
-            FROM daily_spendings 
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date
-        ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return rows
+    first_paint = []
+    history_loaded = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_manager = DatabaseManager(os.path.join(tmp_dir, 'budget_data.db'))
+            today = dt.date.today()
+            budget_map = BudgetMap([(f'Пункт {i}', 1000.0) for i in range(10)], 10000,
+                                   today - dt.timedelta(days=days - 1), today + dt.timedelta(days=days), 0)
+            budget_map.id = db_manager.save_budget_map(budget_map)
+            with db_manager.transaction() as cursor:
+                db_manager.insert_spendings(
+                    cursor,
+                    ((today - dt.timedelta(days=i % days), f'Пункт {i % 10}', 1.0 + i % 7) for i in range(spendings_count)),
+                    budget_map_id=budget_map.id
+                )
+            db_manager.close()
+        
+        for _ in range(runs):
+            started = time.perf_counter()
+            process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--first-paint'],
+                                       cwd=tmp_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for line in process.stdout:
+                if line.startswith('first-paint'):
+                    first_paint.append(time.perf_counter() - started)
+                elif line.startswith('history-loaded'):
+                    history_loaded.append(time.perf_counter() - started)
+            process.wait()
+    
+    for name, timings in (('Первая отрисовка', first_paint), ('История загружена', history_loaded)):
+        timings.sort()
+        print(f"{name:>18}: медиана {timings[len(timings) // 2] * 1000:.1f} мс, "
+              f"минимум {timings[0] * 1000:.1f} мс ({len(timings)} запусков)")
 
 
 class StatisticsDialog(QDialog):
-    def __init__(self, parent=None, budget_map_data=None, daily_spendings_data=None):
+    ADVICE_COLORS = {
+        'excellent': (100, 200, 100),
+        'attention': (255, 200, 100),
+        'warning': (255, 150, 100),
+        'alarm': (255, 100, 100),
+        'neutral': (200, 200, 200),
+    }
+
+    def __init__(self, parent=None, budget_map_data=None, statistics=None, cache=None, analytics=None,
+                 forecast=None):
         super().__init__(parent)
         self.parent = parent
         self.budget_map_data = budget_map_data
-        self.daily_spendings_data = daily_spendings_data
+        self.statistics = statistics
+        self.cache = cache
+        self.analytics = analytics
+        self.forecast = forecast or {}
         
         self.setWindowTitle("Статистика бюджета")
         self.setGeometry(350, 350, 700, 600)
@@ -208,7 +340,8 @@ class StatisticsDialog(QDialog):
         title_label.setStyleSheet("font-size: 16pt; font-weight: bold; margin: 10px; color: #2c3e50;")
         layout.addWidget(title_label)
         
-        self.stats_list = QListWidget()
+        self.stats_model = RowListModel(parent=self)
+        self.stats_list = create_list_view(self.stats_model)
         layout.addWidget(self.stats_list)
                 
         close_btn = QPushButton("Закрыть")
@@ -219,163 +352,49 @@ class StatisticsDialog(QDialog):
 
         self.setLayout(layout)
     
-    def calculate_total_spent_by_item(self):
-        spents = {}
-        if not self.budget_map_data or 'items' not in self.budget_map_data:
-            return spents
-            
-        for item_name, _ in self.budget_map_data['items']:
-            spents[item_name] = 0.0
-        
-        if self.daily_spendings_data:
-            for date_str, spendings in self.daily_spendings_data.items():
-                for spending in spendings:
-                    item_name = spending['item_name']
-                    summa = spending['summa']
-                    if item_name in spents:
-                        spents[item_name] += summa
-        
-        return spents
+    def set_statistics(self, budget_map_data, statistics, analytics=None, forecast=None):
+        self.budget_map_data = budget_map_data
+        self.statistics = statistics
+        self.analytics = analytics
+        self.forecast = forecast or {}
+        self.populate_statistics()
     
-    def calculate_day_stats(self):
-        day_totals = {}
-        weekday_totals = {i: [] for i in range(7)}
-        
-        if self.daily_spendings_data:
-            for date_str, spendings in self.daily_spendings_data.items():
-                try:
-                    date = dt.datetime.strptime(date_str, '%Y-%m-%d').date()
-                    total_day = sum(spending['summa'] for spending in spendings)
-                    day_totals[date_str] = total_day
-                    weekday_totals[date.weekday()].append(total_day)
-                except ValueError:
-                    continue
-        
-        max_day = (None, 0.0)
-        if day_totals:
-            max_day = max(day_totals.items(), key=lambda x: x[1])
-            weekday_sredne = {}
-        for weekday, summi in weekday_totals.items():
-            if summi:
-                weekday_sredne[weekday] = sum(summi) / len(summi)
-        
-        max_weekday = (0, 0.0)
-
-        if weekday_sredne:
-            max_weekday = max(weekday_sredne.items(), key=lambda x: x[1])
-        
+    def weekday_name(self, weekday):
         weekday_names = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-        weekday_name = weekday_names[max_weekday[0]]
-        
-        return max_day, weekday_name
-    
-    def calculate_max_exceed(self, item_spent):
-        max_bigger_item = None
-        max_bigger_summa = 0.0
-        
-        for item_name, spent in item_spent.items():
-            item_budget = 0.0
-            for budget_item, budget_summa in self.budget_map_data['items']:
-                if budget_item == item_name:
-                    item_budget = budget_summa
-                    break
-            
-            if spent > item_budget:
-                exceed = spent - item_budget
-                if exceed > max_bigger_summa:
-                    max_bigger_summa = exceed
-                    max_bigger_item = item_name
-        
-        return max_bigger_item, max_bigger_summa
-    
-    def calculate_budget_adherence(self, total_spent):
-        total_budget = self.budget_map_data['total_budget']
-        if total_budget == 0:
-            return 0.0
-        
-        otklonenie = total_spent - total_budget
-        proccent = (otklonenie / total_budget) * 100
-        if otklonenie > 0:
-            proccent = math.ceil(proccent * 10) / 10
-        else:
-            proccent = math.floor(proccent * 10) / 10
-        
-        return proccent
+        return weekday_names[weekday]
     
-    def get_advice(self, item_spent, total_spent, budget_adherence):
-        total_budget = self.budget_map_data['total_budget']
-        
-        exceeded_items = []
-        for item_name, spent in item_spent.items():
-            item_budget = 0.0
-            for budget_item, budget_summa in self.budget_map_data['items']:
-                if budget_item == item_name:
-                    item_budget = budget_summa
-                    break
-            if spent > item_budget:
-                exceeded_items.append(item_name)
-        
-        if total_spent == 0:
-            return "Да вы, батюшка, аскет!", QtGui.QColor(100, 200, 100)
-        
-        if budget_adherence > 500:
-            return "0_0", QtGui.QColor(255, 100, 100)
-        
-        all_items_count = len(self.budget_map_data['items'])
-        
-        if total_spent <= total_budget and not exceeded_items:
-            return "Вы огромный молодец и справились с поставленной задачей. Так держать!", QtGui.QColor(100, 200, 100)
-        elif total_spent <= total_budget and exceeded_items:
-            items_str = ", ".join(exceeded_items)
-            return f"Неплохо, но вам следует поработать над вашим распределением доходов по следующим пунктам: {items_str}.", QtGui.QColor(255, 200, 100)
-        elif total_spent > total_budget and exceeded_items:
-            items_str = ", ".join(exceeded_items)
-            return f"Вам следует поработать над вашим распределением доходов по следующим пунктам: {items_str}.", QtGui.QColor(255, 150, 100)
-        elif len(exceeded_items) == all_items_count:
-            return "Просто ужасная работа с распределением доходов! Вам следует лучше следить куда вы тратите заработанное!", QtGui.QColor(255, 100, 100)
+    def populate_statistics(self):
+        if self.cache:
+            rows = self.cache.get(('statistics-rows', dt.date.today()), self.statistics_rows)
         else:
-            return "Проанализируйте ваши траты и попробуйте оптимизировать бюджет.", QtGui.QColor(200, 200, 200)
+            rows = self.statistics_rows()
+        self.stats_model.set_rows(rows)
     
-    def populate_statistics(self):
-        self.stats_list.clear()
+    def statistics_rows(self):
+        rows = []
     
-        title_item = QListWidgetItem("=== КАРТА БЮДЖЕТА ===")
-        title_item.setBackground(QtGui.QColor(230, 240, 255))
-        self.stats_list.addItem(title_item)
+        rows.append(("=== КАРТА БЮДЖЕТА ===", (230, 240, 255), None))
     
-        total_budget = self.budget_map_data['total_budget']
-        budget_item = QListWidgetItem(f"Общий бюджет: {total_budget:.1f} руб.")
-        budget_item.setBackground(QtGui.QColor(240, 245, 255))
-        self.stats_list.addItem(budget_item)
+        total_budget = self.budget_map_data.total_budget
+        rows.append((f"Общий бюджет: {total_budget:.1f} руб.", (240, 245, 255), None))
     
-        for item_name, item_summa in self.budget_map_data['items']:
+        for item_name, item_summa in self.budget_map_data.items:
             item_text = f"  {item_name} - {item_summa:.1f} руб."
-            item_list_item = QListWidgetItem(item_text)
-            item_list_item.setBackground(QtGui.QColor(240, 245, 255))
-            self.stats_list.addItem(item_list_item)
+            rows.append((item_text, (240, 245, 255), None))
     
-        self.stats_list.addItem(QListWidgetItem("")) 
+        rows.append(("", None, None))
     
-        total_spent = sum(
-            sum(spending['summa'] for spending in spendings)
-            for spendings in self.daily_spendings_data.values()
-        ) if self.daily_spendings_data else 0.0
+        total_spent = self.statistics.total_spent
     
-        total_item = QListWidgetItem(f"ИТОГОВАЯ СУММА ПОТРАЧЕННОГО: {total_spent:.1f} руб.")
-        total_item.setBackground(QtGui.QColor(200, 230, 255))
-        self.stats_list.addItem(total_item)
+        rows.append((f"ИТОГОВАЯ СУММА ПОТРАЧЕННОГО: {total_spent:.1f} руб.", (200, 230, 255), None))
     
-        self.stats_list.addItem(QListWidgetItem(""))
+        rows.append(("", None, None))
     
-        self.stats_list.addItem(QListWidgetItem("ТРАТЫ ПО ПУНКТАМ:"))
+        rows.append(("ТРАТЫ ПО ПУНКТАМ:", None, None))
     
-        item_spent = self.calculate_total_spent_by_item()
+        item_spent = self.statistics.item_spent
         for item_name, spent in item_spent.items():
-            item_budget = 0.0
-            for budget_item, budget_summa in self.budget_map_data['items']:
-                if budget_item == item_name:
-                    item_budget = budget_summa
-                    break
+            item_budget = self.budget_map_data.amount(item_name)
         
             if item_budget > 0:
                 proccennt = (spent / item_budget) * 100
@@ -384,50 +403,43 @@ class StatisticsDialog(QDialog):
                 proccennt = 0.0
         
             item_text = f"  {item_name} – {spent:.1f} руб. ({proccennt:.1f}%)"
-            item_list_item = QListWidgetItem(item_text)
         
             if spent <= item_budget:
-                item_list_item.setBackground(QtGui.QColor(200, 255, 200))
+                rows.append((item_text, (200, 255, 200), None))
             else:
-                item_list_item.setBackground(QtGui.QColor(255, 200, 200))
-        
-            self.stats_list.addItem(item_list_item)
+                rows.append((item_text, (255, 200, 200), None))
     
-        self.stats_list.addItem(QListWidgetItem("")) 
+        rows.append(("", None, None))
     
-        max_day, max_weekday = self.calculate_day_stats()
+        max_day = self.statistics.max_day
+        max_weekday = self.weekday_name(self.statistics.max_weekday)
 
         if max_day[0]:
-            max_day_date = dt.datetime.strptime(max_day[0], '%Y-%m-%d').strftime('%d.%m.%Y')
-            max_day_item = QListWidgetItem(f"ДЕНЬ МАКСИМАЛЬНЫХ ТРАТ: {max_day_date} - {max_day[1]:.1f} руб.")
+            max_day_date = max_day[0].strftime('%d.%m.%Y')
+            max_day_text = f"ДЕНЬ МАКСИМАЛЬНЫХ ТРАТ: {max_day_date} - {max_day[1]:.1f} руб."
         
-            total_budget = self.budget_map_data['total_budget']
+            total_budget = self.budget_map_data.total_budget
             if max_day[1] > total_budget:
-                max_day_item.setBackground(QtGui.QColor(255, 150, 150))
+                rows.append((max_day_text, (255, 150, 150), None))
             else:
-                max_day_item.setBackground(QtGui.QColor(255, 220, 220))
-        
-            self.stats_list.addItem(max_day_item)
+                rows.append((max_day_text, (255, 220, 220), None))
         else:
-            self.stats_list.addItem(QListWidgetItem("ДЕНЬ МАКСИМАЛЬНЫХ ТРАТ: Нет данных"))
+            rows.append(("ДЕНЬ МАКСИМАЛЬНЫХ ТРАТ: Нет данных", None, None))
     
-        self.stats_list.addItem(QListWidgetItem(f"ДЕНЬ НЕДЕЛИ С МАКС. ТРАТАМИ: {max_weekday}"))
+        rows.append((f"ДЕНЬ НЕДЕЛИ С МАКС. ТРАТАМИ: {max_weekday}", None, None))
     
-        self.stats_list.addItem(QListWidgetItem(""))  
+        rows.append(("", None, None))
 
-        max_exceed_item, max_exceed_summa = self.calculate_max_exceed(item_spent)
+        max_exceed_item, max_exceed_summa = self.statistics.max_exceed
         if max_exceed_item:
-            exceed_item = QListWidgetItem(f"МАКСИМАЛЬНОЕ ПРЕВЫШЕНИЕ: {max_exceed_item} - {max_exceed_summa:.1f} руб.")
-            exceed_item.setBackground(QtGui.QColor(255, 200, 200))
-            self.stats_list.addItem(exceed_item)
+            rows.append((f"МАКСИМАЛЬНОЕ ПРЕВЫШЕНИЕ: {max_exceed_item} - {max_exceed_summa:.1f} руб.",
+                         (255, 200, 200), None))
         else:
-            exceed_item = QListWidgetItem("МАКСИМАЛЬНОЕ ПРЕВЫШЕНИЕ: Отсутствуют 😊")
-            exceed_item.setBackground(QtGui.QColor(200, 255, 200))
-            self.stats_list.addItem(exceed_item)
+            rows.append(("МАКСИМАЛЬНОЕ ПРЕВЫШЕНИЕ: Отсутствуют 😊", (200, 255, 200), None))
     
-        self.stats_list.addItem(QListWidgetItem(""))  
+        rows.append(("", None, None))
     
-        budget_deafult = self.calculate_budget_adherence(total_spent)
+        budget_deafult = self.statistics.budget_adherence
     
         otklonnenie_ot_summo = total_spent - total_budget
     
@@ -438,36 +450,110 @@ class StatisticsDialog(QDialog):
         else:
             deviation_text = f"ЭКОНОМИЯ БЮДЖЕТА: {abs(otklonnenie_ot_summo):.1f} руб. ({adherence_proccent:.1f}%)"
     
-        adherence_item = QListWidgetItem(deviation_text)
-    
         if otklonnenie_ot_summo <= 0:
-            adherence_item.setBackground(QtGui.QColor(200, 255, 200))
+            rows.append((deviation_text, (200, 255, 200), None))
         else:
-            adherence_item.setBackground(QtGui.QColor(255, 200, 200))
+            rows.append((deviation_text, (255, 200, 200), None))
     
-        self.stats_list.addItem(adherence_item)
+        rows.append(("", None, None))
+        rows.append(("─" * 50, None, None))
+        rows.append(("", None, None))
     
-        self.stats_list.addItem(QListWidgetItem(""))  
-        self.stats_list.addItem(QListWidgetItem("─" * 50))
-        self.stats_list.addItem(QListWidgetItem(""))  
+        advice = self.statistics.advice
+        rows.append(("СОВЕТ:", (250, 250, 200), None))
+        rows.append((advice.text, self.ADVICE_COLORS[advice.level], None))
+        
+        rows.extend(self.forecast_rows())
+        rows.extend(self.analytics_rows())
+        
+        return rows
     
-        advice, advice_color = self.get_advice(item_spent, total_spent, budget_deafult)
-        advice_item = QListWidgetItem("СОВЕТ:")
-        advice_item.setBackground(QtGui.QColor(250, 250, 200))
-        self.stats_list.addItem(advice_item)
+    def forecast_rows(self):
+        rows = []
+        if not self.forecast:
+            return rows
+        
+        rows.append(("", None, None))
+        rows.append(("=== ПРОГНОЗ НА КОНЕЦ ПЕРИОДА ===", (230, 240, 255), None))
+        rows.append(("  Пункт – линейный / EWMA / бюджет", None, None))
+        
+        for item_name, item_forecast in self.forecast.items():
+            item_text = (f"  {item_name} – {item_forecast.linear:.1f} / {item_forecast.ewma:.1f} / "
+                         f"{item_forecast.budget:.1f} руб.")
+            if item_forecast.overspend:
+                rows.append((item_text + " – вероятен перерасход", (255, 200, 200), None))
+            else:
+                rows.append((item_text, (200, 255, 200), None))
+        
+        return rows
     
-        advice_text_item = QListWidgetItem(advice)
-        advice_text_item.setBackground(advice_color)
-        self.stats_list.addItem(advice_text_item)
+    def analytics_rows(self):
+        rows = []
+        
+        rows.append(("", None, None))
+        rows.append(("=== АНАЛИТИКА ===", (230, 240, 255), None))
+        
+        analytics = self.analytics
+        if not analytics:
+            rows.append(("Нет данных для аналитики", (240, 240, 240), None))
+            return rows
+        
+        period_text = f"{analytics.first_date.strftime('%d.%m.%Y')} - {analytics.last_date.strftime('%d.%m.%Y')}"
+        rows.append((f"История трат: {period_text}", None, None))
+        
+        rows.append(("", None, None))
+        rows.append(("ТРАТЫ В ДЕНЬ (ПЕРЦЕНТИЛИ):", None, None))
+        for percentile, value in analytics.percentiles.items():
+            rows.append((f"  {percentile}%: {value:.1f} руб.", None, None))
+        
+        rows.append(("", None, None))
+        rows.append(("СКОЛЬЗЯЩЕЕ СРЕДНЕЕ:", None, None))
+        rows.append((f"  За 7 дней: {analytics.rolling_7:.1f} руб./день", None, None))
+        rows.append((f"  За 30 дней: {analytics.rolling_30:.1f} руб./день", None, None))
+        rows.append((f"  Дисперсия изменения за день: {analytics.day_over_day_variance:.1f}", None, None))
+        
+        if analytics.burn_rates:
+            rows.append(("", None, None))
+            rows.append(("СКОРОСТЬ РАСХОДА ПО ПУНКТАМ:", None, None))
+            for item_name, burn_rate in analytics.burn_rates.items():
+                item_text = (f"  {item_name} – {burn_rate.per_day:.1f} руб./день "
+                             f"при плане {burn_rate.budget_per_day:.1f} ({burn_rate.ratio * 100:.0f}%)")
+                if burn_rate.ratio > 1:
+                    rows.append((item_text, (255, 200, 200), None))
+                else:
+                    rows.append((item_text, (200, 255, 200), None))
+        
+        rows.append(("", None, None))
+        rows.append(("ТРАТЫ ПО ДНЯМ НЕДЕЛИ (среднее / медиана / отклонение):", None, None))
+        for weekday, (sredne, mediana, otklonenie) in analytics.weekday_distribution.items():
+            rows.append((f"  {self.weekday_name(weekday)}: {sredne:.1f} / {mediana:.1f} / {otklonenie:.1f} руб.",
+                         None, None))
+        
+        return rows
 
 
 class DaySpendingsViewDialog(QDialog):
-    def __init__(self, parent=None, selected_date=None, budget_map_data=None, daily_spendings_data=None):
+    STATUS_COLORS = {
+        'over': (255, 200, 200),
+        'most': (255, 255, 200),
+        'normal': (200, 255, 200),
+        'empty': (255, 150, 150),
+        'exceeded': (255, 100, 100),
+    }
+    OSTATOK_COLORS = {
+        'negative': (255, 0, 0),
+        'low': (255, 165, 0),
+    }
+
+    def __init__(self, parent=None, selected_date=None, budget_map_data=None, spendings=None, balance_index=None,
+                 cache=None):
         super().__init__(parent)
         self.parent = parent
         self.selected_date = selected_date
         self.budget_map_data = budget_map_data
-        self.daily_spendings_data = daily_spendings_data
+        self.spendings = spendings
+        self.balance_index = balance_index
+        self.cache = cache
         
         self.setWindowTitle("Просмотр трат за день")
         self.setGeometry(350, 350, 600, 500)
@@ -477,11 +563,12 @@ class DaySpendingsViewDialog(QDialog):
     def init_ui(self):
         layout = QVBoxLayout()
         
-        date_label = QLabel(f"Траты за {self.selected_date.strftime('%d.%m.%Y')}")
-        date_label.setStyleSheet("font-size: 14pt; font-weight: bold; margin: 10px;")
-        layout.addWidget(date_label)
+        self.date_label = QLabel(f"Траты за {self.selected_date.strftime('%d.%m.%Y')}")
+        self.date_label.setStyleSheet("font-size: 14pt; font-weight: bold; margin: 10px;")
+        layout.addWidget(self.date_label)
         
-        self.spendings_list = QListWidget()
+        self.spendings_model = RowListModel(parent=self)
+        self.spendings_list = create_list_view(self.spendings_model)
         layout.addWidget(self.spendings_list)
         
         self.populate_spendings_list()
@@ -492,98 +579,57 @@ class DaySpendingsViewDialog(QDialog):
         
         self.setLayout(layout)
     
+    def set_day(self, selected_date, budget_map_data, spendings, balance_index):
+        self.selected_date = selected_date
+        self.budget_map_data = budget_map_data
+        self.spendings = spendings
+        self.balance_index = balance_index
+        self.date_label.setText(f"Траты за {self.selected_date.strftime('%d.%m.%Y')}")
+        self.populate_spendings_list()
+    
     def calculate_ostatok_for_items(self):
-        ostatok_budget = {}
-        for item_name, item_summa in self.budget_map_data['items']:
-            ostatok_budget[item_name] = item_summa
-        
-        for date_str, spendings in self.daily_spendings_data.items():
-            spending_date = dt.datetime.strptime(date_str, '%Y-%m-%d').date()
-            if spending_date < self.selected_date:
-                for spending in spendings:
-                    item_name = spending['item_name']
-                    if item_name in ostatok_budget:
-                        ostatok_budget[item_name] -= spending['summa']
-        
-        return ostatok_budget
+        if self.cache:
+            return self.cache.get(('balances', self.budget_map_data.id, self.selected_date), self.calculate_balances)
+        return self.calculate_balances()
+    
+    def calculate_balances(self):
+        return self.balance_index.balances(self.budget_map_data, self.selected_date)
     
     def populate_spendings_list(self):
-        date_str = self.selected_date.strftime('%Y-%m-%d')
-        
-        ostatok_budget_start = self.calculate_ostatok_for_items()
+        if self.cache:
+            rows = self.cache.get(('day-rows', self.budget_map_data.id, self.selected_date), self.spendings_rows)
+        else:
+            rows = self.spendings_rows()
+        self.spendings_model.set_rows(rows)
+    
+    def spendings_rows(self):
+        rows = []
         
-        if date_str in self.daily_spendings_data:
-            spendings = self.daily_spendings_data[date_str]
-            total_day_spent = 0
-            
-            ostatok = ostatok_budget_start.copy()
+        spendings = self.spendings.day(self.selected_date)
+        if spendings:
+            balance = day_balance(self.calculate_ostatok_for_items(), spendings)
             
-            for spending in spendings:
-                item_name = spending['item_name']
-                summa = spending['summa']
-                total_day_spent += summa
-                
-                ostatok_before_spending = ostatok.get(item_name, 0)
-                
-                if item_name in ostatok:
-                    ostatok[item_name] -= summa
-                
-                item_total_budget = 0
-                for budget_item, budget_summa in self.budget_map_data['items']:
-                    if budget_item == item_name:
-                        item_total_budget = budget_summa
-                        break
-                
-                if ostatok_before_spending > 0:
-                    if summa > ostatok_before_spending + 0.01:
-                        color = QtGui.QColor(255, 200, 200)
-                        status = "ПРЕВЫШЕНИЕ ОСТАТКА"
-                    elif summa >= ostatok_before_spending * 0.85: 
-                        color = QtGui.QColor(255, 255, 200)
-                        status = "БОЛЬШАЯ ЧАСТЬ ОСТАТКА"
-                    else:
-                        color = QtGui.QColor(200, 255, 200)
-                        status = "НОРМА"
-                    
-                    item_text = f"{item_name} - {summa:.2f} руб. (остаток было: {ostatok_before_spending:.2f} руб.) - {status}"
-                elif ostatok_before_spending == 0:
-                    color = QtGui.QColor(255, 150, 150)
-                    status = "НЕТ ОСТАТКА"
-                    item_text = f"{item_name} - {summa:.2f} руб. (остаток было: 0.00 руб.) - {status}"
-                else:
-                    color = QtGui.QColor(255, 100, 100)
-                    status = "УЖЕ ПРЕВЫШЕНО"
-                    item_text = f"{item_name} - {summa:.2f} руб. (остаток было: {ostatok_before_spending:.2f} руб.) - {status}"
-                
-                list_item = QListWidgetItem(item_text)
-                list_item.setBackground(color)
-                self.spendings_list.addItem(list_item)
+            for spending in balance.spendings:
+                status = SPENDING_STATUSES[spending.status]
+                item_text = (f"{spending.item_name} - {spending.summa:.2f} руб. "
+                             f"(остаток было: {spending.ostatok_before:.2f} руб.) - {status}")
+                rows.append((item_text, self.STATUS_COLORS[spending.status], None))
             
-            self.spendings_list.addItem(QListWidgetItem("─" * 60))
+            rows.append(("─" * 60, None, None))
             
-            self.spendings_list.addItem(QListWidgetItem("Остатки после трат:"))
-            for item_name in ostatok:
-                ostatok_start = ostatok_budget_start.get(item_name, 0)
-                ostatok_end = ostatok.get(item_name, 0)
-                
-                if date_str in self.daily_spendings_data:
-                    day_spendings_for_item = [s for s in self.daily_spendings_data[date_str] if s['item_name'] == item_name]
-                    if day_spendings_for_item:
-                        ostatok_item = QListWidgetItem(f"  {item_name}: {ostatok_end:.2f} руб.")
-                        if ostatok_end < 0:
-                            ostatok_item.setForeground(QtGui.QColor(255, 0, 0))
-                        elif ostatok_end < ostatok_start * 0.15:
-                            ostatok_item.setForeground(QtGui.QColor(255, 165, 0))
-                        self.spendings_list.addItem(ostatok_item)
+            rows.append(("Остатки после трат:", None, None))
+            day_items = {spending.item_name for spending in spendings}
+            for item_name, ostatok_end in balance.ostatok_end.items():
+                if item_name in day_items:
+                    foreground = self.OSTATOK_COLORS.get(ostatok_status(balance.ostatok_start.get(item_name, 0), ostatok_end))
+                    rows.append((f"  {item_name}: {ostatok_end:.2f} руб.", None, foreground))
             
-            total_item = QListWidgetItem(f"ВСЕГО ЗА ДЕНЬ: {total_day_spent:.2f} руб.")
-            total_item.setBackground(QtGui.QColor(180, 200, 255))
-            self.spendings_list.addItem(total_item)
+            rows.append((f"ВСЕГО ЗА ДЕНЬ: {balance.total:.2f} руб.", (180, 200, 255), None))
             
         else:
-            no_data_item = QListWidgetItem("Трат за этот день не зафиксировано")
-            no_data_item.setBackground(QtGui.QColor(240, 240, 240))
-            self.spendings_list.addItem(no_data_item)
+            rows.append(("Трат за этот день не зафиксировано", (240, 240, 240), None))
+        
+        return rows
 
 
 class DaySpendingsDialog(QDialog):
@@ -595,23 +641,22 @@ class DaySpendingsDialog(QDialog):
         
         self.daily_spendings = []
         self.selected_date = dt.date.today()
+        self.budget_map_data = None
         
         self.load_existing_spendings()
         
         self.init_ui()
         
     def load_existing_spendings(self):
-        if self.parent and hasattr(self.parent, 'daily_spendings_data'):
-            today_str = self.selected_date.strftime('%Y-%m-%d')
-            if today_str in self.parent.daily_spendings_data:
-                self.daily_spendings = self.parent.daily_spendings_data[today_str].copy()
+        if self.parent and self.parent.budget_map_data:
+            self.daily_spendings = list(self.parent.day_spendings(self.selected_date))
         
     def init_ui(self):
         layout = QVBoxLayout()
         
-        date_label = QLabel(f"Траты за {self.selected_date.strftime('%d.%m.%Y')}")
-        date_label.setStyleSheet("font-size: 14pt; font-weight: bold;")
-        layout.addWidget(date_label)
+        self.date_label = QLabel(f"Траты за {self.selected_date.strftime('%d.%m.%Y')}")
+        self.date_label.setStyleSheet("font-size: 14pt; font-weight: bold;")
+        layout.addWidget(self.date_label)
         
         input_layout = QHBoxLayout()
         
@@ -628,7 +673,8 @@ class DaySpendingsDialog(QDialog):
         
         layout.addLayout(input_layout)
         
-        self.spendings_list = QListWidget()
+        self.spendings_model = RowListModel(format_row=self.spending_row, parent=self)
+        self.spendings_list = create_list_view(self.spendings_model)
         layout.addWidget(QLabel("Добавленные траты:"))
         layout.addWidget(self.spendings_list)
         
@@ -652,13 +698,24 @@ class DaySpendingsDialog(QDialog):
         
         self.setLayout(layout)
     
+    def reset_day(self):
+        self.selected_date = dt.date.today()
+        self.date_label.setText(f"Траты за {self.selected_date.strftime('%d.%m.%Y')}")
+        self.load_existing_spendings()
+        if self.budget_map_data is not self.parent.budget_map_data:
+            self.populate_budget_items()
+        self.vvod_summi.clear()
+        self.update_spendings_list()
+    
     def populate_budget_items(self):
         if not self.parent or not self.parent.budget_map_data:
             QMessageBox.warning(self, "Ошибка", "Сначала создайте карту бюджета!")
             self.close()
             return
-            
-        budget_items = self.parent.budget_map_data['items']
+        
+        self.budget_map_data = self.parent.budget_map_data
+        self.item_combo.clear()
+        budget_items = self.budget_map_data.items
         for item_name, item_summa in budget_items:
             self.item_combo.addItem(f"{item_name} (бюджет: {item_summa} руб.)", item_name)
     
@@ -674,10 +731,10 @@ class DaySpendingsDialog(QDialog):
             self.vvod_summi.setCursorPosition(len(cleaned))
     
     def update_spendings_list(self):
-        self.spendings_list.clear()
-        for spending in self.daily_spendings:
-            spending_text = f"{spending['item_name']} - {spending['summa']:.2f} руб."
-            self.spendings_list.addItem(spending_text)
+        self.spendings_model.set_rows(self.daily_spendings)
+    
+    def spending_row(self, spending):
+        return f"{spending.item_name} - {spending.summa:.2f} руб.", None, None
     
     def add_spending(self):
         if self.item_combo.count() == 0:
@@ -700,14 +757,8 @@ class DaySpendingsDialog(QDialog):
         
         selected_index = self.item_combo.currentIndex()
         item_name = self.item_combo.itemData(selected_index)
-        display_text = self.item_combo.currentText()
         
-        spending_data = {
-            'item_name': item_name,
-            'summa': summa,
-            'display_text': display_text
-        }
-        self.daily_spendings.append(spending_data)
+        self.daily_spendings.append(Spending(item_name, summa))
         
         self.update_spendings_list()
         
@@ -726,6 +777,73 @@ class DaySpendingsDialog(QDialog):
         self.accept()
 
 
+class PeriodComparisonDialog(QDialog):
+    def __init__(self, parent=None, periods=None, item_periods=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.periods = periods or []
+        self.item_periods = item_periods or {}
+        
+        self.setWindowTitle("Сравнение периодов")
+        self.setGeometry(350, 350, 700, 600)
+        
+        self.init_ui()
+    
+    def init_ui(self):
+        layout = QVBoxLayout()
+        
+        title_label = QLabel("СРАВНЕНИЕ ПЕРИОДОВ")
+        title_label.setStyleSheet("font-size: 16pt; font-weight: bold; margin: 10px; color: #2c3e50;")
+        layout.addWidget(title_label)
+        
+        self.periods_model = RowListModel(parent=self)
+        self.periods_list = create_list_view(self.periods_model)
+        layout.addWidget(self.periods_list)
+        
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.close)
+        layout.addWidget(close_btn)
+        
+        self.periods_model.set_rows(self.comparison_rows())
+        
+        self.setLayout(layout)
+    
+    def comparison_rows(self):
+        rows = []
+        
+        for period in self.periods:
+            period_text = f"{period.start_date.strftime('%d.%m.%Y')} - {period.end_date.strftime('%d.%m.%Y')}"
+            if not period.closed:
+                period_text += " (текущий)"
+            rows.append((f"=== {period_text} ===", (230, 240, 255), None))
+            
+            spent_text = f"Потрачено: {period.spent:.1f} из {period.total_budget:.1f} руб."
+            if period.spent > period.total_budget:
+                rows.append((spent_text, (255, 200, 200), None))
+            else:
+                rows.append((spent_text, (200, 255, 200), None))
+            
+            rows.append((f"В среднем за день: {period.per_day:.1f} руб. (место {period.per_day_rank} из {len(self.periods)})",
+                         None, None))
+            rows.append((f"Среднее за последние 3 периода: {period.per_day_average:.1f} руб./день", None, None))
+            if period.spent_change is not None:
+                rows.append((f"Изменение к прошлому периоду: {period.spent_change:+.1f} руб. "
+                             f"({period.per_day_change:+.1f} руб./день)", None, None))
+            
+            for item in self.item_periods.get(period.id, ()):
+                item_text = f"  {item.item_name} – {item.spent:.1f} из {item.budget:.1f} руб."
+                if item.spent_change is not None:
+                    item_text += f" ({item.spent_change:+.1f})"
+                if item.spent > item.budget:
+                    rows.append((item_text, None, (255, 0, 0)))
+                else:
+                    rows.append((item_text, None, None))
+            
+            rows.append(("", None, None))
+        
+        return rows
+
+
 class BudgetMapDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -761,7 +879,8 @@ class BudgetMapDialog(QDialog):
         
         layout.addLayout(input_layout)
         
-        self.items_list = QListWidget()
+        self.items_model = RowListModel(parent=self)
+        self.items_list = create_list_view(self.items_model)
         layout.addWidget(QLabel("Добавленные пункты:"))
         layout.addWidget(self.items_list)
         
@@ -909,7 +1028,7 @@ class BudgetMapDialog(QDialog):
         self.ostatok_budget -= item_summa
         
         item_text = f"{item_name} - {item_summa} руб. (Остаток для распределения: {self.ostatok_budget} руб.)"
-        self.items_list.addItem(item_text)
+        self.items_model.append_row((item_text, None, None))
         
         self.item_name_input.clear()
         self.item_summa_input.clear()
@@ -930,123 +1049,48 @@ class BudgetMapDialog(QDialog):
             return
         
         if self.parent:
-            self.parent.budget_map_data = {
-                'items': self.budget_items,
-                'total_budget': self.total_budget,
-                'start_date': self.start_date,
-                'end_date': self.end_date,
-                'initial_ostatok': self.ostatok_budget,
-                'actual_ostatok': self.total_budget
-            }
+            self.parent.clear_old_data()
+            self.parent.budget_map_data = BudgetMap(
+                self.budget_items,
+                self.total_budget,
+                self.start_date,
+                self.end_date,
+                self.ostatok_budget
+            )
+            self.parent.reset_statistics()
             self.parent.highlight_budget_period()
             self.parent.display_budget_map()
             self.parent.save_budget_map() 
         
         self.accept()
-        
+
 
 class CartSpenndings(QMainWindow):
+    first_paint = QtCore.pyqtSignal()
+    history_loaded = QtCore.pyqtSignal()
+
     def __init__(self):
         super().__init__()
         
-        template = '''<?xml version="1.0" encoding="UTF-8"?>
-<ui version="4.0">
- <class>MainWindow</class>
- <widget class="QMainWindow" name="MainWindow">
-  <property name="geometry">
-   <rect>
-    <x>0</x>
-    <y>0</y>
-    <width>925</width>
-    <height>597</height>
-   </rect>
-  </property>
-  <property name="windowTitle">
-   <string>MainWindow</string>
-  </property>
-  <widget class="QWidget" name="centralwidget">
-   <widget class="QWidget" name="gridLayoutWidget_2">
-    <property name="geometry">
-     <rect>
-      <x>0</x>
-      <y>0</y>
-      <width>931</width>
-      <height>571</height>
-     </rect>
-    </property>
-    <layout class="QGridLayout" name="gridLayout_2">
-     <item row="1" column="1">
-      <widget class="QDateTimeEdit" name="dateTimeEdit"/>
-     </item>
-     <item row="1" column="0">
-      <layout class="QHBoxLayout" name="horizontalLayout">
-       <item>
-        <widget class="QPushButton" name="pushButton_4">
-         <property name="text">
-          <string>Составить карту бюджета</string>
-         </property>
-        </widget>
-       </item>
-       <item>
-        <widget class="QPushButton" name="pushButton_2">
-         <property name="text">
-          <string>Записать расходы</string>
-         </property>
-        </widget>
-       </item>
-       <item>
-        <widget class="QPushButton" name="pushButton_3">
-         <property name="text">
-          <string>Показать траты за день</string>
-         </property>
-        </widget>
-       </item>
-       <item>
-        <widget class="QPushButton" name="pushButton">
-         <property name="text">
-          <string>Подвести статистику</string>
-         </property>
-        </widget>
-       </item>
-      </layout>
-     </item>
-     <item row="0" column="0">
-      <widget class="QCalendarWidget" name="calendarWidget"/>
-     </item>
-     <item row="0" column="1">
-      <widget class="QListWidget" name="listWidget"/>
-     </item>
-    </layout>
-   </widget>
-  </widget>
-  <widget class="QMenuBar" name="menubar">
-   <property name="geometry">
-    <rect>
-     <x>0</x>
-     <y>0</y>
-     <width>925</width>
-     <height>19</height>
-    </rect>
-   </property>
-  </widget>
-  <widget class="QStatusBar" name="statusbar"/>
- </widget>
- <resources/>
- <connections/>
-</ui>
-'''
-        f = io.StringIO(template)
-        uic.loadUi(f, self)
-
-        timedata = dt.datetime.now()
-        
-        self.calendarWidget = self.findChild(QtWidgets.QCalendarWidget, 'calendarWidget')
-        self.timeDataEdit = self.findChild(QtWidgets.QDateTimeEdit, 'dateTimeEdit')
-        self.addPunktBtn = self.findChild(QtWidgets.QPushButton, 'pushButton_2')
-        self.seeSpendingsBtn = self.findChild(QtWidgets.QPushButton, 'pushButton_3')
-        self.endStatisticBtn = self.findChild(QtWidgets.QPushButton, 'pushButton')
-        self.doCartBtn = self.findChild(QtWidgets.QPushButton, 'pushButton_4')
-        self.eventList = self.findChild(QtWidgets.QListWidget, 'listWidget')
+        self.budget_map_data = None
+        self.spending_store = SpendingStore()
+        self.balance_index = BalanceIndex()
+        self.statistics = StatisticsEngine()
+        self.forecaster = SpendingForecaster()
+        self.cache = VersionedCache()
+        self.spending_ranges = SpendingRangeCache(self.fetch_spendings)
+        self.history_store = None
+        self.budget_periods = []
+        self.day_spendings_dialog = None
+        self.day_view_dialog = None
+        self.statistics_dialog = None
+        self.selected_calendar_date = dt.date.today()
+        self.db_manager = None
+        self.spendings_journal = None
+        self.painted = False
+        self.stopped = False
+        
+        self.setup_ui()
         
         self.timeDataEdit.setEnabled(False)
         
@@ -1056,21 +1100,161 @@ class CartSpenndings(QMainWindow):
         self.timer.timeout.connect(self.update_time)
         self.timer.start(1000) 
 
-        self.budget_map_data = None
-        self.daily_spendings_data = {}
-        self.selected_calendar_date = dt.date.today()
-
         self.doCartBtn.clicked.connect(self.cart_doing)
         self.addPunktBtn.clicked.connect(self.get_day_spendings)
         self.seeSpendingsBtn.clicked.connect(self.show_day_spendings)
         self.endStatisticBtn.clicked.connect(self.final_statistics)
+        self.comparePeriodsBtn.clicked.connect(self.compare_periods)
+        self.periodBox.currentIndexChanged.connect(self.on_period_selected)
         
         self.calendarWidget.selectionChanged.connect(self.on_calendar_date_selected)
+        self.calendarWidget.currentPageChanged.connect(self.on_calendar_page_changed)
 
         self.setWindowTitle("Инспектор бюджета")
         
+        self.persistence = PersistenceWorker(self)
+        self.persistence.saved.connect(self.on_data_saved)
+        self.persistence.failed.connect(self.on_save_failed)
+        self.persistence.budget_map_saved.connect(self.on_budget_map_saved)
+        self.persistence.start()
+        
+        self.set_controls_enabled(False)
+        self.statusBar().showMessage("Загрузка истории трат...")
+
+    def setup_ui(self):
+        self.resize(925, 597)
+        
+        central_widget = QtWidgets.QWidget(self)
+        grid_layout = QtWidgets.QGridLayout(central_widget)
+        
+        self.calendarWidget = BudgetCalendarWidget()
+        grid_layout.addWidget(self.calendarWidget, 0, 0)
+        
+        self.event_model = RowListModel(parent=self)
+        self.eventList = create_list_view(self.event_model)
+        grid_layout.addWidget(self.eventList, 0, 1)
+        
+        buttons_layout = QHBoxLayout()
+        self.doCartBtn = QPushButton("Составить карту бюджета")
+        self.addPunktBtn = QPushButton("Записать расходы")
+        self.seeSpendingsBtn = QPushButton("Показать траты за день")
+        self.endStatisticBtn = QPushButton("Подвести статистику")
+        self.comparePeriodsBtn = QPushButton("Сравнить периоды")
+        for button in (self.doCartBtn, self.addPunktBtn, self.seeSpendingsBtn, self.endStatisticBtn,
+                       self.comparePeriodsBtn):
+            buttons_layout.addWidget(button)
+        grid_layout.addLayout(buttons_layout, 1, 0)
+        
+        self.timeDataEdit = QtWidgets.QDateTimeEdit()
+        grid_layout.addWidget(self.timeDataEdit, 1, 1)
+        
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("Период:"))
+        self.periodBox = QComboBox()
+        period_layout.addWidget(self.periodBox)
+        grid_layout.addLayout(period_layout, 2, 0)
+        
+        self.setCentralWidget(central_widget)
+        self.setMenuBar(QtWidgets.QMenuBar(self))
+        self.setStatusBar(QtWidgets.QStatusBar(self))
+
+    def set_controls_enabled(self, enabled):
+        for widget in (self.doCartBtn, self.addPunktBtn, self.seeSpendingsBtn, self.endStatisticBtn,
+                       self.comparePeriodsBtn, self.periodBox):
+            widget.setEnabled(enabled)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.first_paint.emit()
+            QTimer.singleShot(0, self.load_history)
+
+    def load_history(self):
+        from budget_core.storage import DatabaseManager, SpendingsJournal
+        
         self.db_manager = DatabaseManager()
+        self.spendings_journal = SpendingsJournal()
         self.load_data()
+        
+        self.set_controls_enabled(True)
+        self.statusBar().clearMessage()
+        self.history_loaded.emit()
+
+    def closeEvent(self, event):
+        self.shutdown()
+        super().closeEvent(event)
+
+    def shutdown(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.persistence.stop()
+        if self.db_manager:
+            self.db_manager.close()
+
+    def cache_stats(self):
+        return {'cache': self.cache.stats(), 'spending_ranges': self.spending_ranges.stats()}
+
+    def on_data_saved(self, message):
+        print(message)
+        self.statusBar().showMessage(message, 3000)
+        self.display_budget_map()
+
+    def on_save_failed(self, error):
+        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить данные: {error}")
+
+    def on_budget_map_saved(self, budget_map_data, budget_map_id):
+        budget_map_data.id = budget_map_id
+        self.populate_periods()
+
+    def populate_periods(self):
+        self.periodBox.blockSignals(True)
+        self.periodBox.clear()
+        self.budget_periods = self.db_manager.get_budget_maps()
+        self.history_store = None
+        self.calendarWidget.clear_heat()
+        self.refresh_calendar_heat()
+        for period in self.budget_periods:
+            period_text = f"{period.start_date.strftime('%d.%m.%Y')} - {period.end_date.strftime('%d.%m.%Y')}"
+            if period.closed:
+                period_text += " (закрыт)"
+            self.periodBox.addItem(period_text, period.id)
+        
+        if self.budget_map_data and self.budget_map_data.id is not None:
+            self.periodBox.setCurrentIndex(self.periodBox.findData(self.budget_map_data.id))
+        self.periodBox.blockSignals(False)
+
+    def on_period_selected(self, index):
+        budget_map_id = self.periodBox.itemData(index)
+        if budget_map_id is None or (self.budget_map_data and self.budget_map_data.id == budget_map_id):
+            return
+        
+        self.persistence.flush()
+        budget_map_data = self.db_manager.get_budget_map(budget_map_id)
+        if not budget_map_data:
+            return
+        
+        self.budget_map_data = budget_map_data
+        self.load_daily_spendings()
+        self.reset_statistics()
+        self.highlight_budget_period()
+        self.display_budget_map()
+
+    def compare_periods(self):
+        self.persistence.flush()
+        
+        periods = self.db_manager.get_period_comparison()
+        if not periods:
+            QMessageBox.warning(self, "Ошибка", "Сначала создайте карту бюджета!")
+            return
+        
+        dialog = PeriodComparisonDialog(
+            parent=self,
+            periods=periods,
+            item_periods=self.db_manager.get_item_period_comparison()
+        )
+        dialog.exec()
 
     def update_time(self):
         self.timeDataEdit.setDateTime(QDateTime.currentDateTime())
@@ -1079,9 +1263,74 @@ class CartSpenndings(QMainWindow):
         selected_date = self.calendarWidget.selectedDate()
         self.selected_calendar_date = dt.date(selected_date.year(), selected_date.month(), selected_date.day())
 
+    def on_calendar_page_changed(self, year, month):
+        month_start = dt.date(year, month, 1)
+        month_end = (month_start + dt.timedelta(days=32)).replace(day=1) - dt.timedelta(days=1)
+        self.refresh_calendar_heat()
+        
+        total_spent = 0.0
+        for period in self.budget_periods:
+            if period.start_date <= month_end and month_start <= period.end_date:
+                total_spent += self.period_spendings(period).range(month_start, month_end).total()
+        
+        if total_spent:
+            self.statusBar().showMessage(f"Потрачено за {month:02d}.{year}: {total_spent:.2f} руб.", 3000)
+
+    def refresh_calendar_heat(self):
+        shown = dt.date(self.calendarWidget.yearShown(), self.calendarWidget.monthShown(), 1)
+        start = (shown - dt.timedelta(days=1)).replace(day=1)
+        end = (shown + dt.timedelta(days=63)).replace(day=1) - dt.timedelta(days=1)
+        for period in self.budget_periods:
+            if period.start_date <= end and start <= period.end_date:
+                self.period_spendings(period)
+        
+        month_heat = {(date.year, date.month): {} for date in (start, shown, end)}
+        for date, heat in self.calendar_heat(start, end).items():
+            month_heat[date.year, date.month][date] = heat
+        for (year, month), heat in month_heat.items():
+            self.calendarWidget.set_month_heat(year, month, heat)
+
+    def calendar_heat(self, start, end):
+        totals = collections.defaultdict(float)
+        allowances = {}
+        for period in self.budget_periods:
+            if period.start_date <= end and start <= period.end_date:
+                spendings = self.period_spendings(period, fetch=False)
+                if spendings is None:
+                    continue
+                allowance = period.total_budget / ((period.end_date - period.start_date).days + 1)
+                day_totals = spendings.range(max(start, period.start_date), min(end, period.end_date)).day_totals()
+                for date, total in day_totals.items():
+                    totals[date] += total
+                    allowances.setdefault(date, allowance)
+        return {date: day_heat(total, allowances[date]) for date, total in totals.items()}
+
+    def fetch_spendings(self, start, end, budget_map_id=None):
+        self.persistence.flush()
+        return self.db_manager.iter_spendings(start, end, budget_map_id=budget_map_id)
+
+    def period_spendings(self, period, fetch=True):
+        if self.budget_map_data and period.id == self.budget_map_data.id:
+            return self.spending_store
+        if not fetch:
+            return self.spending_ranges.cached(period.start_date, period.end_date, period.id)
+        return self.spending_ranges.get(period.start_date, period.end_date, period.id)
+
+    def find_period(self, date):
+        if self.budget_map_data and self.budget_map_data.start_date <= date <= self.budget_map_data.end_date:
+            return self.budget_map_data
+        for period in self.budget_periods:
+            if period.start_date <= date <= period.end_date:
+                return period
+        return None
+
+    def day_spendings(self, date):
+        budget_map_data = self.budget_map_data
+        if budget_map_data.start_date <= date <= budget_map_data.end_date or date in self.spending_store:
+            return self.spending_store.day(date)
+        return self.spending_ranges.get(date, date, budget_map_data.id).day(date)
+
     def cart_doing(self):
-        self.clear_old_data()
-        
         dialog = BudgetMapDialog(self)
         result = dialog.exec()
         
@@ -1090,34 +1339,35 @@ class CartSpenndings(QMainWindow):
             print("Созданная карта бюджета:", self.budget_map_data)
 
     def clear_old_data(self):
-        self.db_manager.clear_all_data()
+        self.persistence.flush()
         
         try:
-            if os.path.exists('budget_map.csv'):
-                os.remove('budget_map.csv')
-            if os.path.exists('daily_spendings.csv'):
-                os.remove('daily_spendings.csv')
-            print("CSV файлы очищены")
+            self.spendings_journal.clear()
+            print("CSV журнал трат прошлого периода очищен")
         except Exception as e:
-            print(f"Ошибка при очистке CSV файлов: {e}")
+            print(f"Ошибка при очистке CSV журнала: {e}")
         
         self.budget_map_data = None
-        self.daily_spendings_data = {}
-        self.eventList.clear()
-        
-        current_date = self.calendarWidget.minimumDate()
-        end_calendar = self.calendarWidget.maximumDate()
-        while current_date <= end_calendar:
-            self.calendarWidget.setDateTextFormat(current_date, QTextCharFormat())
-            current_date = current_date.addDays(1)
+        self.spending_store = SpendingStore()
+        self.balance_index = BalanceIndex()
+        self.reset_statistics()
+        self.event_model.clear()
+        self.calendarWidget.set_period()
 
     def get_day_spendings(self):
         if not self.budget_map_data:
             QMessageBox.warning(self, "Ошибка", "Сначала создайте карту бюджета!")
             return
+        
+        if self.budget_map_data.closed:
+            QMessageBox.warning(self, "Ошибка", "Этот период закрыт, его траты можно только просматривать")
+            return
             
-        dialog = DaySpendingsDialog(self)
-        result = dialog.exec()
+        if self.day_spendings_dialog is None:
+            self.day_spendings_dialog = DaySpendingsDialog(self)
+        else:
+            self.day_spendings_dialog.reset_day()
+        result = self.day_spendings_dialog.exec()
         
         if result == QDialog.DialogCode.Accepted:
             QMessageBox.information(self, "Успех", "Дневные траты успешно учтены!")
@@ -1126,75 +1376,134 @@ class CartSpenndings(QMainWindow):
         if not self.budget_map_data:
             QMessageBox.warning(self, "Ошибка", "Сначала создайте карту бюджета!")
             return
-            
-        dialog = DaySpendingsViewDialog(
-            parent=self,
-            selected_date=self.selected_calendar_date,
-            budget_map_data=self.budget_map_data,
-            daily_spendings_data=self.daily_spendings_data
-        )
-        dialog.exec()
+        
+        period = self.find_period(self.selected_calendar_date)
+        if period is None or period.id == self.budget_map_data.id:
+            budget_map_data = self.budget_map_data
+            spendings = self.spending_store
+            balance_index = self.balance_index
+        else:
+            budget_map_data = self.cache.get(('budget-map', period.id), lambda: self.db_manager.get_budget_map(period.id))
+            spendings = self.spending_ranges.get(period.start_date, period.end_date, period.id)
+            balance_index = self.spending_ranges.balance_index(period.start_date, period.end_date, period.id)
+        
+        if self.day_view_dialog is None:
+            self.day_view_dialog = DaySpendingsViewDialog(
+                parent=self,
+                selected_date=self.selected_calendar_date,
+                budget_map_data=budget_map_data,
+                spendings=spendings.view(),
+                balance_index=balance_index,
+                cache=self.cache
+            )
+        else:
+            self.day_view_dialog.set_day(self.selected_calendar_date, budget_map_data, spendings.view(), balance_index)
+        self.day_view_dialog.exec()
 
     def final_statistics(self):
         if not self.budget_map_data:
             QMessageBox.warning(self, "Ошибка", "Сначала создайте карту бюджета!")
             return
+        
+        statistics = self.cache.get('statistics', self.statistics.snapshot)
+        analytics = self.cache.get(('analytics', dt.date.today()), self.calculate_analytics)
+        forecast = self.cache.get(('forecast', dt.date.today()), self.forecaster.forecast)
+        
+        if self.statistics_dialog is None:
+            self.statistics_dialog = StatisticsDialog(
+                parent=self,
+                budget_map_data=self.budget_map_data,
+                statistics=statistics,
+                cache=self.cache,
+                analytics=analytics,
+                forecast=forecast
+            )
+        else:
+            self.statistics_dialog.set_statistics(self.budget_map_data, statistics, analytics, forecast)
+        self.statistics_dialog.exec()
+
+    def calculate_analytics(self):
+        try:
+            from budget_core.analytics import SpendingAnalytics
             
-        dialog = StatisticsDialog(
-            parent=self,
-            budget_map_data=self.budget_map_data,
-            daily_spendings_data=self.daily_spendings_data
-        )
-        dialog.exec()
+            analytics = SpendingAnalytics(self.history_spendings()).report()
+            if analytics is None:
+                return None
+            burn_rates = SpendingAnalytics(self.spending_store).burn_rates(self.budget_map_data, dt.date.today())
+            return analytics._replace(burn_rates=burn_rates)
+        except ImportError as e:
+            print(f"Аналитика недоступна: {e}")
+            return None
 
-    def process_daily_spendings(self, spendings, date):
-        date_str = date.strftime('%Y-%m-%d')
-        
-        self.daily_spendings_data[date_str] = spendings
+    def history_spendings(self):
+        if self.history_store is None:
+            self.history_store = SpendingStore.merge(
+                self.period_spendings(period) for period in reversed(self.budget_periods))
+        return self.history_store
+
+    def update_history(self, date, old_spendings, spendings):
+        if self.history_store is None:
+            return
         
-        self.display_budget_map()
+        removed = collections.Counter(old_spendings)
+        rows = []
+        for spending in self.history_store.day(date):
+            if removed[spending]:
+                removed[spending] -= 1
+            else:
+                rows.append(spending)
+        self.history_store.set_day(date, rows + list(spendings))
+
+    def process_daily_spendings(self, spendings, date):
+        old_spendings = self.spending_store.set_day(date, spendings)
+        self.balance_index.update_day(date, old_spendings, spendings)
+        self.statistics.update_day(date, old_spendings, spendings)
+        self.forecaster.update_day(date, old_spendings, spendings)
+        self.update_history(date, old_spendings, spendings)
+        self.spending_ranges.discard(date, self.budget_map_data.id, keep=self.spending_store)
+        self.cache.bump()
+        self.calendarWidget.update_day(date, self.calendar_heat(date, date).get(date))
         
         self.save_daily_spendings(date, spendings)
         
-        total_spent = sum(spending['summa'] for spending in spendings)
+        total_spent = sum(spending.summa for spending in spendings)
         QMessageBox.information(self, "Итог дня", 
                                f"За {date.strftime('%d.%m.%Y')} потрачено: {total_spent:.2f} руб.")
 
     def save_budget_map(self):
         if not self.budget_map_data:
             return
-            
-        try:
-            self.db_manager.save_budget_map(self.budget_map_data)
-            print("Карта бюджета сохранена в БД")
-            
-            self.save_budget_map_to_csv()
-            
-        except Exception as e:
-            print(f"Ошибка при сохранении карты бюджета: {e}")
-            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить карту бюджета: {e}")
+        
+        budget_map_data = self.budget_map_data
+        
+        def job():
+            budget_map_id = self.db_manager.save_budget_map(budget_map_data)
+            budget_map_data.id = budget_map_id
+            self.persistence.budget_map_saved.emit(budget_map_data, budget_map_id)
+            self.save_budget_map_to_csv(budget_map_data)
+            return "Карта бюджета сохранена"
+        
+        self.persistence.submit(('budget_map', id(budget_map_data)), job)
 
-    def save_budget_map_to_csv(self):
+    def save_budget_map_to_csv(self, budget_map_data):
+        from budget_core.storage import atomic_write_csv
+        
         try:
-            with open('budget_map.csv', 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                
-                writer.writerow(['total_budget', 'start_date', 'end_date', 'initial_ostatok'])
-                
-                writer.writerow([
-                    self.budget_map_data['total_budget'],
-                    self.budget_map_data['start_date'].strftime('%Y-%m-%d'),
-                    self.budget_map_data['end_date'].strftime('%Y-%m-%d'),
-                    self.budget_map_data['initial_ostatok']
-                ])
-                
-                writer.writerow([])
-                writer.writerow(['budget_items'])
-                writer.writerow(['item_name', 'item_summa'])
-                
-                for item_name, item_summa in self.budget_map_data['items']:
-                    writer.writerow([item_name, item_summa])
-                    
+            rows = [
+                ['total_budget', 'start_date', 'end_date', 'initial_ostatok'],
+                [
+                    budget_map_data.total_budget,
+                    budget_map_data.start_date.strftime('%Y-%m-%d'),
+                    budget_map_data.end_date.strftime('%Y-%m-%d'),
+                    budget_map_data.initial_ostatok
+                ],
+                [],
+                ['budget_items'],
+                ['item_name', 'item_summa'],
+            ]
+            rows.extend([item_name, item_summa] for item_name, item_summa in budget_map_data.items)
+            
+            atomic_write_csv('budget_map.csv', rows)
             print("Карта бюджета сохранена в CSV")
             
         except Exception as e:
@@ -1203,32 +1512,25 @@ class CartSpenndings(QMainWindow):
     def save_daily_spendings(self, date, spendings):
         if not spendings:
             return
-            
+        
+        spendings = [Spending(*spending) for spending in spendings]
+        budget_map_data = self.budget_map_data
+        
+        def job():
+            self.db_manager.save_daily_spendings(date, spendings, budget_map_data.id)
+            self.save_daily_spendings_to_csv(date, spendings, budget_map_data.id)
+            return f"Траты за {date.strftime('%d.%m.%Y')} сохранены"
+        
+        self.persistence.submit(('daily_spendings', date), job)
+
+    def save_daily_spendings_to_csv(self, date, spendings, budget_map_id=None):
         try:
-            self.db_manager.save_daily_spendings(date, spendings)
-            print("Дневные траты сохранены в БД")
+            self.spendings_journal.append_day(date, spendings)
             
-            self.save_daily_spendings_to_csv()
+            if self.spendings_journal.needs_compaction():
+                self.spendings_journal.compact(self.db_manager.iter_spendings(budget_map_id=budget_map_id))
+                print("Журнал трат сжат в CSV")
             
-        except Exception as e:
-            print(f"Ошибка при сохранении дневных трат: {e}")
-            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить дневные траты: {e}")
-
-    def save_daily_spendings_to_csv(self):
-        try:
-            with open('daily_spendings.csv', 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                
-                writer.writerow(['date', 'item_name', 'summa'])
-                
-                for date_str, spendings_list in self.daily_spendings_data.items():
-                    for spending in spendings_list:
-                        writer.writerow([
-                            date_str,
-                            spending['item_name'],
-                            spending['summa']
-                        ])
-                        
             print("Дневные траты сохранены в CSV")
             
         except Exception as e:
@@ -1238,16 +1540,23 @@ class CartSpenndings(QMainWindow):
         self.load_budget_map()
         self.load_daily_spendings()
         
-        if not self.budget_map_data:
-            self.load_budget_map_from_csv()
+        import_budget_map = not self.budget_map_data
+        import_spendings = not self.db_manager.has_spendings()
+        if import_budget_map or import_spendings:
+            self.load_from_csv(import_budget_map, import_spendings)
         
-        if not self.daily_spendings_data:
-            self.load_daily_spendings_from_csv()
+        self.reset_statistics()
+        self.populate_periods()
         
         if self.budget_map_data:
             self.highlight_budget_period()
             self.display_budget_map()
 
+    def reset_statistics(self):
+        self.statistics.reset(self.budget_map_data, self.spending_store)
+        self.forecaster.reset(self.budget_map_data, self.spending_store)
+        self.cache.bump()
+
     def load_budget_map(self):
         try:
             self.budget_map_data = self.db_manager.get_latest_budget_map()
@@ -1257,187 +1566,138 @@ class CartSpenndings(QMainWindow):
         except Exception as e:
             print(f"Ошибка при загрузке карты бюджета: {e}")
 
-    def load_budget_map_from_csv(self):
-        try:
-            if not os.path.exists('budget_map.csv'):
-                return
-                
-            with open('budget_map.csv', 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                
-                next(reader)
-                
-                main_data = next(reader)
-                if not main_data:
-                    return
-                    
-                total_budget = int(main_data[0])
-                start_date = dt.datetime.strptime(main_data[1], '%Y-%m-%d').date()
-                end_date = dt.datetime.strptime(main_data[2], '%Y-%m-%d').date()
-                initial_ostatok = int(main_data[3])
-                
-                next(reader)
-                next(reader)
-                next(reader)
-                
-                budget_items = []
-                for row in reader:
-                    if row:
-                        item_name = row[0]
-                        item_summa = int(row[1])
-                        budget_items.append((item_name, item_summa))
-                
-                self.budget_map_data = {
-                    'items': budget_items,
-                    'total_budget': total_budget,
-                    'start_date': start_date,
-                    'end_date': end_date,
-                    'initial_ostatok': initial_ostatok,
-                    'actual_ostatok': total_budget
-                }
-                
-            print("Карта бюджета загружена из CSV")
-            
-            if self.budget_map_data:
-                self.db_manager.save_budget_map(self.budget_map_data)
-                print("Данные из CSV перенесены в БД")
-                
-        except Exception as e:
-            print(f"Ошибка при загрузке карты бюджета из CSV: {e}")
-
     def load_daily_spendings(self):
+        if not self.budget_map_data or self.budget_map_data.id is None:
+            self.spending_store = SpendingStore()
+            self.balance_index = BalanceIndex()
+            return
+        
         try:
-            self.daily_spendings_data = self.db_manager.get_all_daily_spendings()
-            if self.daily_spendings_data:
+            window = (self.budget_map_data.start_date, self.budget_map_data.end_date, self.budget_map_data.id)
+            self.spending_store = self.spending_ranges.get(*window)
+            self.balance_index = self.spending_ranges.balance_index(*window)
+            if self.spending_store:
                 print("Дневные траты загружены из БД")
                 
         except Exception as e:
             print(f"Ошибка при загрузке дневных трат: {e}")
 
-    def load_daily_spendings_from_csv(self):
+    def load_from_csv(self, import_budget_map=True, import_spendings=True):
+        budget_map_path = 'budget_map.csv' if import_budget_map and os.path.exists('budget_map.csv') else None
+        journal = self.spendings_journal if import_spendings and self.spendings_journal.exists() else None
+        if not budget_map_path and not journal:
+            return
+        
+        from budget_core.storage import CsvImporter
+        
+        importer = CsvImporter(self.db_manager, progress=self.on_import_progress)
         try:
-            if not os.path.exists('daily_spendings.csv'):
-                return
-                
-            with open('daily_spendings.csv', 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                
-                next(reader)
-                
-                self.daily_spendings_data = {}
-                for row in reader:
-                    if row:
-                        date_str = row[0]
-                        item_name = row[1]
-                        summa = float(row[2])
-                        
-                        if date_str not in self.daily_spendings_data:
-                            self.daily_spendings_data[date_str] = []
-                            
-                        self.daily_spendings_data[date_str].append({
-                            'item_name': item_name,
-                            'summa': summa,
-                            'display_text': f"{item_name} (бюджет: ... руб.)"
-                        })
-                
-            print("Дневные траты загружены из CSV")
-            
-            for date_str, spendings in self.daily_spendings_data.items():
-                date = dt.datetime.strptime(date_str, '%Y-%m-%d').date()
-                self.db_manager.save_daily_spendings(date, spendings)
-            print("Данные из CSV перенесены в БД")
-                
+            budget_map_data = importer.import_csv(budget_map_path, journal)
+            print(f"Данные из CSV перенесены в БД (трат: {importer.imported})")
         except Exception as e:
-            print(f"Ошибка при загрузке дневных трат из CSV: {e}")
+            print(f"Ошибка при загрузке данных из CSV: {e}")
+            return
+        
+        if budget_map_data:
+            self.budget_map_data = budget_map_data
+            print("Карта бюджета загружена из CSV")
+        if journal:
+            self.spending_ranges.clear()
+            self.load_daily_spendings()
+            print("Дневные траты загружены из CSV")
+
+    def on_import_progress(self, count):
+        self.statusBar().showMessage(f"Импорт трат из CSV: {count}")
 
     def highlight_budget_period(self):
         if not self.budget_map_data:
             return
             
-        start_date = self.budget_map_data['start_date']
-        end_date = self.budget_map_data['end_date']
-        
-        highlight_format = QTextCharFormat()
-        highlight_format.setBackground(QtGui.QColor(173, 216, 230))
-        
-        current_date = self.calendarWidget.minimumDate()
-        end_calendar = self.calendarWidget.maximumDate()
-        
-        while current_date <= end_calendar:
-            self.calendarWidget.setDateTextFormat(current_date, QTextCharFormat())
-            current_date = current_date.addDays(1)
-        
-        current_date = start_date
-        while current_date <= end_date:
-            qt_date = QtCore.QDate(current_date.year, current_date.month, current_date.day)
-            self.calendarWidget.setDateTextFormat(qt_date, highlight_format)
-            current_date += dt.timedelta(days=1)
+        self.calendarWidget.set_period(self.budget_map_data.start_date, self.budget_map_data.end_date)
 
     def display_budget_map(self):
         if not self.budget_map_data:
             return
-            
-        self.eventList.clear()
         
-        title_item = QListWidgetItem("=== КАРТА БЮДЖЕТА ===")
-        title_item.setBackground(QtGui.QColor(200, 230, 255))
-        self.eventList.addItem(title_item)
+        self.event_model.set_rows(self.cache.get(('budget-map-rows', dt.date.today()), self.budget_map_rows))
+
+    def budget_map_rows(self):
+        rows = []
+        
+        rows.append(("=== КАРТА БЮДЖЕТА ===", (200, 230, 255), None))
         
-        start_date = self.budget_map_data['start_date']
-        end_date = self.budget_map_data['end_date']
+        start_date = self.budget_map_data.start_date
+        end_date = self.budget_map_data.end_date
         period_text = f"Период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}"
-        period_item = QListWidgetItem(period_text)
-        self.eventList.addItem(period_item)
+        rows.append((period_text, None, None))
         
-        total_budget = self.budget_map_data['total_budget']
-        initial_ostatok = self.budget_map_data['initial_ostatok']
+        total_budget = self.budget_map_data.total_budget
+        initial_ostatok = self.budget_map_data.initial_ostatok
         
-        budget_text = f"Общий бюджет: {total_budget} руб."
-        budget_item = QListWidgetItem(budget_text)
-        self.eventList.addItem(budget_item)
+        rows.append((f"Общий бюджет: {total_budget} руб.", None, None))
         
         total_spent = self.calculate_total_spent()
         actual_ostatok = total_budget - total_spent
         
-        distributed_text = f"Распределено по пунктам: {total_budget - initial_ostatok} руб."
-        distributed_item = QListWidgetItem(distributed_text)
-        self.eventList.addItem(distributed_item)
+        rows.append((f"Распределено по пунктам: {total_budget - initial_ostatok} руб.", None, None))
         
         ostatok_text = f"Остаток бюджета: {actual_ostatok:.2f} руб."
-        ostatok_item = QListWidgetItem(ostatok_text)
         if actual_ostatok < 0:
-            ostatok_item.setForeground(QtGui.QColor(255, 0, 0))
-        self.eventList.addItem(ostatok_item)
+            rows.append((ostatok_text, None, (255, 0, 0)))
+        else:
+            rows.append((ostatok_text, None, None))
         
         if total_spent > 0:
-            spent_text = f"Всего потрачено: {total_spent:.2f} руб."
-            spent_item = QListWidgetItem(spent_text)
-            spent_item.setForeground(QtGui.QColor(200, 0, 0))
-            self.eventList.addItem(spent_text)
+            rows.append((f"Всего потрачено: {total_spent:.2f} руб.", None, None))
         
-        separator_item = QListWidgetItem("─" * 30)
-        separator_item.setForeground(QtGui.QColor(128, 128, 128))
-        self.eventList.addItem(separator_item)
+        rows.append(("─" * 30, None, (128, 128, 128)))
         
-        items_title_item = QListWidgetItem("Пункты бюджета:")
-        items_title_item.setBackground(QtGui.QColor(230, 230, 230))
-        self.eventList.addItem(items_title_item)
+        rows.append(("Пункты бюджета:", (230, 230, 230), None))
         
-        budget_items = self.budget_map_data['items']
+        budget_items = self.budget_map_data.items
         for i, (item_name, item_summa) in enumerate(budget_items, 1):
-            item_text = f"{i}. {item_name} - {item_summa} руб."
-            list_item = QListWidgetItem(item_text)
-            self.eventList.addItem(list_item)
+            rows.append((f"{i}. {item_name} - {item_summa} руб.", None, None))
+        
+        forecast = self.cache.get(('forecast', dt.date.today()), self.forecaster.forecast)
+        if forecast:
+            rows.append(("─" * 30, None, (128, 128, 128)))
+            rows.append(("Прогноз на конец периода:", (230, 230, 230), None))
+            for item_name, item_forecast in forecast.items():
+                forecast_text = f"{item_name}: {item_forecast.projected:.2f} из {item_forecast.budget} руб."
+                if item_forecast.overspend:
+                    rows.append((forecast_text + " – вероятен перерасход", None, (255, 0, 0)))
+                else:
+                    rows.append((forecast_text, None, None))
+        
+        return rows
 
     def calculate_total_spent(self):
-        total = 0
-        for date_str, spendings in self.daily_spendings_data.items():
-            total += sum(spending['summa'] for spending in spendings)
-        return total
+        return self.statistics.total
 
 
 if __name__ == '__main__':
+    if '--benchmark-calendar' in sys.argv:
+        app = QApplication(sys.argv)
+        benchmark_calendar()
+        sys.exit(0)
+    
+    if '--benchmark-startup' in sys.argv:
+        benchmark_startup()
+        sys.exit(0)
+    
+    if len(sys.argv) > 1 and '--first-paint' not in sys.argv:
+        from budget_core.cli import run as run_cli
+        
+        exit_code = run_cli(sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
     app = QApplication(sys.argv)
     planner = CartSpenndings()
+    app.aboutToQuit.connect(planner.shutdown)
+    if '--first-paint' in sys.argv:
+        planner.first_paint.connect(lambda: print('first-paint', flush=True))
+        planner.history_loaded.connect(lambda: print('history-loaded', flush=True))
+        planner.history_loaded.connect(app.quit)
     planner.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,56 @@
+import importlib
+
+
+EXPORTS = {
+    'SpendingAnalytics': 'analytics',
+    'BalanceIndex': 'balances',
+    'SPENDING_STATUSES': 'balances',
+    'day_balance': 'balances',
+    'day_heat': 'balances',
+    'ostatok_status': 'balances',
+    'spending_status': 'balances',
+    'SpendingRangeCache': 'cache',
+    'VersionedCache': 'cache',
+    'Advice': 'models',
+    'AnalyticsReport': 'models',
+    'BudgetItem': 'models',
+    'BudgetMap': 'models',
+    'BudgetPeriod': 'models',
+    'BurnRate': 'models',
+    'CacheStats': 'models',
+    'DayBalance': 'models',
+    'DayHeat': 'models',
+    'DaySpendingBalance': 'models',
+    'ItemComparison': 'models',
+    'ItemForecast': 'models',
+    'PeriodComparison': 'models',
+    'Spending': 'models',
+    'StatisticsSnapshot': 'models',
+    'SpendingForecaster': 'statistics',
+    'StatisticsEngine': 'statistics',
+    'check_statistics_engine': 'statistics',
+    'get_advice': 'statistics',
+    'ConnectPerCallDatabaseManager': 'storage',
+    'CsvImporter': 'storage',
+    'DatabaseManager': 'storage',
+    'SpendingsJournal': 'storage',
+    'atomic_write_csv': 'storage',
+    'SpendingSlice': 'store',
+    'SpendingStore': 'store',
+    'SpendingStoreView': 'store',
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    module_name = EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
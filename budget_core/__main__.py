@@ -0,0 +1,11 @@
+import sys
+
+from .cli import run
+
+
+exit_code = run(sys.argv[1:])
+if exit_code is None:
+    print("Использование: python -m budget_core "
+          "[--benchmark-db | --benchmark-budget | --benchmark-analytics | --check-stats | --check-db [--repair]]")
+    exit_code = 2
+sys.exit(exit_code)
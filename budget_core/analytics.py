@@ -0,0 +1,82 @@
+import datetime as dt
+
+from .models import AnalyticsReport, BurnRate
+
+
+class SpendingAnalytics:
+    PERCENTILES = (50, 75, 90, 95)
+
+    def __init__(self, store):
+        import numpy as np
+        
+        self.np = np
+        self.store = store
+        self.days = np.frombuffer(store.days, dtype=np.intc)
+        self.item_ids = np.frombuffer(store.item_ids, dtype=np.intc)
+        self.amounts = np.frombuffer(store.amounts, dtype=np.float64)
+
+    def daily_totals(self):
+        np = self.np
+        first_day = int(self.days[0])
+        span = int(self.days[-1]) - first_day + 1
+        return first_day, np.bincount(self.days - first_day, weights=self.amounts, minlength=span)
+
+    def rolling_means(self, totals, window):
+        np = self.np
+        cumulative = np.concatenate(([0.0], np.cumsum(totals)))
+        ends = np.arange(1, len(totals) + 1)
+        starts = np.maximum(ends - window, 0)
+        return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+    def burn_rates(self, budget_map, as_of):
+        np = self.np
+        as_of = min(max(as_of, budget_map.start_date), budget_map.end_date)
+        elapsed = (as_of - budget_map.start_date).days + 1
+        
+        lo, hi = self.store.bounds(budget_map.start_date, as_of)
+        spent = np.bincount(self.item_ids[lo:hi], weights=self.amounts[lo:hi],
+                            minlength=len(self.store.item_names))
+        
+        burn_rates = {}
+        for item_name, item_amount in budget_map.index.items():
+            item_id = self.store.item_index.get(item_name)
+            item_spent = float(spent[item_id]) if item_id is not None else 0.0
+            per_day = item_spent / elapsed
+            budget_per_day = item_amount / budget_map.period_days
+            ratio = per_day / budget_per_day if budget_per_day else 0.0
+            burn_rates[item_name] = BurnRate(item_spent, per_day, budget_per_day, ratio)
+        return burn_rates
+
+    def weekday_distribution(self, first_day, totals):
+        np = self.np
+        weekdays = (np.arange(first_day, first_day + len(totals)) - 1) % 7
+        distribution = {}
+        for weekday in range(7):
+            values = totals[weekdays == weekday]
+            if len(values):
+                distribution[weekday] = (float(values.mean()), float(np.median(values)), float(values.std()))
+        return distribution
+
+    def report(self, budget_map=None, as_of=None):
+        if not len(self.store):
+            return None
+        
+        np = self.np
+        first_day, totals = self.daily_totals()
+        percentiles = dict(zip(self.PERCENTILES, np.percentile(totals, self.PERCENTILES).tolist()))
+        day_over_day = np.diff(totals)
+        
+        burn_rates = {}
+        if budget_map:
+            burn_rates = self.burn_rates(budget_map, as_of or dt.date.today())
+        
+        return AnalyticsReport(
+            dt.date.fromordinal(first_day),
+            dt.date.fromordinal(first_day + len(totals) - 1),
+            percentiles,
+            float(self.rolling_means(totals, 7)[-1]),
+            float(self.rolling_means(totals, 30)[-1]),
+            burn_rates,
+            self.weekday_distribution(first_day, totals),
+            float(day_over_day.var()) if len(day_over_day) else 0.0
+        )
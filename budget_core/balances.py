@@ -0,0 +1,123 @@
+import bisect
+import collections
+from array import array
+
+from .models import DayBalance, DayHeat, DaySpendingBalance
+
+
+class BalanceIndex:
+    EPSILON = 1e-9
+
+    def __init__(self):
+        self.days = {}
+        self.prefix = {}
+
+    @classmethod
+    def from_store(cls, store):
+        index = cls()
+        for date, rows in store.iter_days():
+            index.update_day(date, (), rows)
+        return index
+
+    def spent_before(self, item_name, date):
+        days = self.days.get(item_name)
+        if not days:
+            return 0.0
+        k = bisect.bisect_left(days, date.toordinal())
+        return self.prefix[item_name][k - 1] if k else 0.0
+
+    def balances(self, budget_map, date):
+        return {item_name: item_amount - self.spent_before(item_name, date)
+                for item_name, item_amount in budget_map.index.items()}
+
+    def update_day(self, date, old_rows, new_rows):
+        deltas = collections.defaultdict(float)
+        for item_name, summa in old_rows:
+            deltas[item_name] -= summa
+        for item_name, summa in new_rows:
+            deltas[item_name] += summa
+        
+        day = date.toordinal()
+        for item_name, delta in deltas.items():
+            if delta:
+                self.apply_delta(item_name, day, delta)
+
+    def apply_delta(self, item_name, day, delta):
+        days = self.days.setdefault(item_name, array('i'))
+        prefix = self.prefix.setdefault(item_name, array('d'))
+        
+        k = bisect.bisect_left(days, day)
+        if k < len(days) and days[k] == day:
+            day_total = prefix[k] - (prefix[k - 1] if k else 0.0) + delta
+            if abs(day_total) < self.EPSILON:
+                del days[k]
+                del prefix[k]
+        else:
+            days.insert(k, day)
+            prefix.insert(k, prefix[k - 1] if k else 0.0)
+        
+        for i in range(k, len(prefix)):
+            prefix[i] += delta
+
+
+SPENDING_STATUSES = {
+    'over': "ПРЕВЫШЕНИЕ ОСТАТКА",
+    'most': "БОЛЬШАЯ ЧАСТЬ ОСТАТКА",
+    'normal': "НОРМА",
+    'empty': "НЕТ ОСТАТКА",
+    'exceeded': "УЖЕ ПРЕВЫШЕНО",
+}
+
+
+def spending_status(summa, ostatok_before):
+    if ostatok_before > 0:
+        if summa > ostatok_before + 0.01:
+            return 'over'
+        elif summa >= ostatok_before * 0.85:
+            return 'most'
+        return 'normal'
+    elif ostatok_before == 0:
+        return 'empty'
+    return 'exceeded'
+
+
+def ostatok_status(ostatok_start, ostatok_end):
+    if ostatok_end < 0:
+        return 'negative'
+    elif ostatok_end < ostatok_start * 0.15:
+        return 'low'
+    return 'normal'
+
+
+def day_balance(ostatok_start, spendings):
+    ostatok = dict(ostatok_start)
+    rows = []
+    total = 0
+    
+    for item_name, summa in spendings:
+        total += summa
+        
+        ostatok_before = ostatok.get(item_name, 0)
+        if item_name in ostatok:
+            ostatok[item_name] -= summa
+        
+        rows.append(DaySpendingBalance(item_name, summa, ostatok_before, spending_status(summa, ostatok_before)))
+    
+    return DayBalance(rows, ostatok_start, ostatok, total)
+
+
+def day_heat(total, allowance):
+    if allowance > 0:
+        ratio = total / allowance
+    else:
+        ratio = float('inf') if total > 0 else 0.0
+    
+    if ratio > 1:
+        level = 'over'
+    elif ratio > 0.75:
+        level = 'high'
+    elif ratio > 0.4:
+        level = 'medium'
+    else:
+        level = 'low'
+    return DayHeat(total, allowance, ratio, level)
@@ -0,0 +1,119 @@
+import contextlib
+import datetime as dt
+import io
+import os
+import random
+import tempfile
+import time
+
+from .analytics import SpendingAnalytics
+from .balances import BalanceIndex, day_balance
+from .models import BudgetMap, Spending
+from .statistics import StatisticsEngine, get_advice
+from .storage import ConnectPerCallDatabaseManager, DatabaseManager
+from .store import SpendingStore
+
+
+def benchmark_database(iterations=300, days=60, spendings_per_day=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, manager_class in (('connect-per-call', ConnectPerCallDatabaseManager),
+                                    ('persistent', DatabaseManager)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager = manager_class(os.path.join(tmp_dir, f'{name}.db'))
+            start_day = dt.date.today()
+            spendings = [Spending(f'Пункт {i}', 10.0 * (i + 1)) for i in range(spendings_per_day)]
+            budget_data = BudgetMap(
+                [(spending.item_name, 1000) for spending in spendings],
+                1000 * spendings_per_day,
+                start_day,
+                start_day + dt.timedelta(days=days),
+                0
+            )
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                manager.save_budget_map(budget_data)
+                for day in range(days):
+                    manager.save_daily_spendings(start_day + dt.timedelta(days=day), spendings)
+                for i in range(iterations):
+                    manager.get_latest_budget_map()
+                    manager.get_spendings_by_date_range(start_day, start_day + dt.timedelta(days=i % days))
+                results[name] = time.perf_counter() - started
+                manager.close()
+
+    for name, elapsed in results.items():
+        print(f"{name:>18}: {elapsed * 1000:.1f} мс")
+    print(f"Ускорение: x{results['connect-per-call'] / results['persistent']:.1f}")
+    return results
+
+
+class ScanBudgetMap(BudgetMap):
+    def amount(self, item_name, default=0.0):
+        for budget_item, budget_summa in self.items:
+            if budget_item == item_name:
+                return budget_summa
+        return default
+
+
+def benchmark_budget_lookup(items_count=500, spendings_count=50000, days=30, repeats=10):
+    rng = random.Random(1)
+    start_date = dt.date.today()
+    dates = [start_date + dt.timedelta(days=day) for day in range(days)]
+    budget_items = [(f'Пункт {i}', 100.0 + i) for i in range(items_count)]
+    total_budget = sum(amount for _, amount in budget_items)
+    rows = sorted((rng.choice(dates), f'Пункт {rng.randrange(items_count)}', rng.randrange(1, 400) / 4)
+                  for _ in range(spendings_count))
+    store = SpendingStore.from_rows(rows)
+    balance_index = BalanceIndex.from_store(store)
+
+    def measure(function):
+        function()
+        started = time.perf_counter()
+        for _ in range(repeats):
+            function()
+        return (time.perf_counter() - started) / repeats
+
+    def day_view(budget_map):
+        for date in dates:
+            day_balance(balance_index.balances(budget_map, date), store.day(date))
+
+    results = {}
+    for lookup, map_class in (('linear-scan', ScanBudgetMap), ('index', BudgetMap)):
+        budget_map = map_class(budget_items, total_budget, dates[0], dates[-1], 0)
+        engine = StatisticsEngine(budget_map, store)
+        snapshot = engine.snapshot()
+        results['make_snapshot', lookup] = measure(engine.snapshot)
+        results['get_advice', lookup] = measure(
+            lambda: get_advice(budget_map, snapshot.item_spent, snapshot.total_spent, snapshot.budget_adherence))
+    results['day_balance'] = measure(lambda: day_view(budget_map))
+
+    print(f"{items_count} пунктов, {spendings_count} трат, {days} дней")
+    for name in ('make_snapshot', 'get_advice'):
+        scan = results[name, 'linear-scan']
+        indexed = results[name, 'index']
+        print(f"{name:>14}: линейный поиск {scan * 1000:.2f} мс, индекс {indexed * 1000:.2f} мс "
+              f"(x{scan / indexed:.0f})")
+    print(f"{'day_balance':>14}: {results['day_balance'] * 1000 / days:.2f} мс на день "
+          f"(BalanceIndex.balances + day_balance)")
+    return results
+
+
+def benchmark_analytics(spendings_count=100000, items_count=50, days=730, repeats=20):
+    rng = random.Random(1)
+    first_date = dt.date.today() - dt.timedelta(days=days)
+    rows = sorted((first_date + dt.timedelta(days=rng.randrange(days)), f'Пункт {rng.randrange(items_count)}',
+                   rng.randrange(1, 5000) / 4) for _ in range(spendings_count))
+    store = SpendingStore.from_rows(rows)
+    budget_items = [(f'Пункт {i}', 1000.0) for i in range(items_count)]
+    budget_map = BudgetMap(budget_items, 1000.0 * items_count, first_date, first_date + dt.timedelta(days=days), 0)
+    
+    analytics = SpendingAnalytics(store)
+    analytics.report(budget_map)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        analytics.report(budget_map)
+    elapsed = (time.perf_counter() - started) / repeats
+    
+    print(f"Аналитика: {elapsed * 1000:.2f} мс ({spendings_count} трат, {days} дней, {items_count} пунктов)")
+    return elapsed
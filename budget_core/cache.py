@@ -0,0 +1,92 @@
+import collections
+
+from .balances import BalanceIndex
+from .models import CacheStats
+from .store import SpendingStore
+
+
+class VersionedCache:
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.version = 0
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self):
+        self.version += 1
+        self.entries.clear()
+        return self.version
+
+    def get(self, key, compute):
+        key = (self.version, key)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        return CacheStats(len(self.entries), self.maxsize, self.hits, self.misses)
+
+    def __repr__(self):
+        return (f"VersionedCache(version={self.version}, size={len(self.entries)}/{self.maxsize}, "
+                f"hits={self.hits}, misses={self.misses})")
+
+
+class SpendingRangeCache:
+    def __init__(self, fetch, maxsize=12):
+        self.fetch = fetch
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, start, end, budget_map_id=None):
+        key = (budget_map_id, start, end)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        
+        self.misses += 1
+        entry = [SpendingStore.from_rows(self.fetch(start, end, budget_map_id)), None]
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return entry
+
+    def get(self, start, end, budget_map_id=None):
+        return self.entry(start, end, budget_map_id)[0]
+
+    def cached(self, start, end, budget_map_id=None):
+        entry = self.entries.get((budget_map_id, start, end))
+        return entry[0] if entry else None
+
+    def balance_index(self, start, end, budget_map_id=None):
+        entry = self.entry(start, end, budget_map_id)
+        if entry[1] is None:
+            entry[1] = BalanceIndex.from_store(entry[0])
+        return entry[1]
+
+    def discard(self, date, budget_map_id, keep=None):
+        for key, (store, _) in list(self.entries.items()):
+            entry_map_id, start, end = key
+            if entry_map_id == budget_map_id and start <= date <= end and store is not keep:
+                del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return CacheStats(len(self.entries), self.maxsize, self.hits, self.misses)
+
+    def __repr__(self):
+        return (f"SpendingRangeCache(size={len(self.entries)}/{self.maxsize}, "
+                f"hits={self.hits}, misses={self.misses})")
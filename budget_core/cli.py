@@ -0,0 +1,59 @@
+import os
+
+from .benchmarks import benchmark_analytics, benchmark_budget_lookup, benchmark_database
+from .statistics import check_statistics_engine
+from .storage import DatabaseManager
+
+
+def check_database(repair=False, db_path='budget_data.db'):
+    if not os.path.exists(db_path):
+        print(f"Файл БД {db_path} не найден")
+        return 1
+
+    db_manager = DatabaseManager(db_path)
+    plans, plan_failures = db_manager.check_query_plans()
+    for name, details in plans.items():
+        print(f"{name}: {'; '.join(details)}")
+    for name, index_name in plan_failures:
+        print(f"Запрос {name} не использует индекс {index_name}")
+
+    mismatches = db_manager.check_rollups(repair=repair)
+    for name, key, expected, actual in mismatches:
+        print(f"Расхождение в {name} {key}: ожидалось {expected}, получено {actual}")
+    if mismatches and repair:
+        mismatches = db_manager.check_rollups()
+    if not mismatches:
+        print("Сводные таблицы согласованы")
+    db_manager.close()
+    return 1 if plan_failures or mismatches else 0
+
+
+def check_statistics():
+    failures = check_statistics_engine()
+    for history, step, name, mismatches in failures:
+        print(f"История {history}, шаг {step} ({name}): расхождение в {', '.join(mismatches)}")
+    if not failures:
+        print("Инкрементальная статистика совпадает с полным пересчётом")
+    return 1 if failures else 0
+
+
+def run(argv):
+    if '--benchmark-db' in argv:
+        benchmark_database()
+        return 0
+
+    if '--benchmark-budget' in argv:
+        benchmark_budget_lookup()
+        return 0
+
+    if '--benchmark-analytics' in argv:
+        benchmark_analytics()
+        return 0
+
+    if '--check-stats' in argv:
+        return check_statistics()
+
+    if '--check-db' in argv:
+        return check_database(repair='--repair' in argv)
+
+    return None
@@ -0,0 +1,64 @@
+import collections
+
+
+Spending = collections.namedtuple('Spending', ['item_name', 'summa'])
+BudgetItem = collections.namedtuple('BudgetItem', ['name', 'amount', 'position', 'share'])
+BudgetPeriod = collections.namedtuple('BudgetPeriod', ['id', 'start_date', 'end_date', 'total_budget', 'closed'])
+PeriodComparison = collections.namedtuple('PeriodComparison', [
+    'id', 'start_date', 'end_date', 'total_budget', 'spent', 'per_day',
+    'spent_change', 'per_day_change', 'per_day_average', 'per_day_rank', 'closed'
+])
+ItemComparison = collections.namedtuple('ItemComparison', ['item_name', 'budget', 'spent', 'spent_change'])
+StatisticsSnapshot = collections.namedtuple('StatisticsSnapshot', [
+    'total_spent', 'spendings_count', 'item_spent', 'max_day',
+    'weekday_averages', 'max_weekday', 'max_exceed', 'budget_adherence', 'advice'
+])
+Advice = collections.namedtuple('Advice', ['text', 'level'])
+DaySpendingBalance = collections.namedtuple('DaySpendingBalance', ['item_name', 'summa', 'ostatok_before', 'status'])
+DayBalance = collections.namedtuple('DayBalance', ['spendings', 'ostatok_start', 'ostatok_end', 'total'])
+ItemForecast = collections.namedtuple('ItemForecast', ['spent', 'budget', 'linear', 'ewma', 'projected', 'overspend'])
+AnalyticsReport = collections.namedtuple('AnalyticsReport', [
+    'first_date', 'last_date', 'percentiles', 'rolling_7', 'rolling_30',
+    'burn_rates', 'weekday_distribution', 'day_over_day_variance'
+])
+BurnRate = collections.namedtuple('BurnRate', ['spent', 'per_day', 'budget_per_day', 'ratio'])
+DayHeat = collections.namedtuple('DayHeat', ['total', 'allowance', 'ratio', 'level'])
+CacheStats = collections.namedtuple('CacheStats', ['size', 'maxsize', 'hits', 'misses'])
+
+
+class BudgetMap:
+    def __init__(self, items, total_budget, start_date, end_date, initial_ostatok, id=None, closed=False):
+        self.items = [(item_name, item_amount) for item_name, item_amount in items]
+        self.total_budget = total_budget
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_ostatok = initial_ostatok
+        self.actual_ostatok = total_budget
+        self.id = id
+        self.closed = closed
+        
+        self.index = {}
+        self.metadata = {}
+        for position, (item_name, item_amount) in enumerate(self.items):
+            if item_name in self.index:
+                continue
+            self.index[item_name] = item_amount
+            share = item_amount / total_budget if total_budget else 0.0
+            self.metadata[item_name] = BudgetItem(item_name, item_amount, position, share)
+
+    def __contains__(self, item_name):
+        return item_name in self.index
+
+    def amount(self, item_name, default=0.0):
+        return self.index.get(item_name, default)
+
+    def item_names(self):
+        return self.index.keys()
+
+    @property
+    def period_days(self):
+        return (self.end_date - self.start_date).days + 1
+
+    def __repr__(self):
+        return (f"BudgetMap(id={self.id}, total_budget={self.total_budget}, "
+                f"period={self.start_date}..{self.end_date}, items={self.items})")
@@ -0,0 +1,298 @@
+import collections
+import datetime as dt
+import heapq
+import math
+
+from .models import Advice, BudgetMap, ItemForecast, Spending, StatisticsSnapshot
+from .store import SpendingStore
+
+
+class StatisticsEngine:
+    TOLERANCE = 0.005
+
+    def __init__(self, budget_map=None, store=None):
+        self.reset(budget_map, store)
+
+    def reset(self, budget_map=None, store=None):
+        self.budget_map = budget_map
+        self.total = 0.0
+        self.count = 0
+        self.item_totals = collections.defaultdict(float)
+        self.day_totals = {}
+        self.weekday_sums = [0.0] * 7
+        self.weekday_days = [0] * 7
+        self.max_heap = []
+        
+        if budget_map and store:
+            for date, rows in store.iter_days(budget_map.start_date, budget_map.end_date):
+                self.update_day(date, (), rows)
+
+    def in_period(self, date):
+        return self.budget_map is not None and self.budget_map.start_date <= date <= self.budget_map.end_date
+
+    def update_day(self, date, old_rows, new_rows):
+        if not self.in_period(date):
+            return
+        
+        for item_name, summa in old_rows:
+            self.total -= summa
+            self.count -= 1
+            self.item_totals[item_name] -= summa
+        for item_name, summa in new_rows:
+            self.total += summa
+            self.count += 1
+            self.item_totals[item_name] += summa
+        
+        day = date.toordinal()
+        weekday = date.weekday()
+        old_total = self.day_totals.pop(day, None)
+        if old_total is not None:
+            self.weekday_sums[weekday] -= old_total
+            self.weekday_days[weekday] -= 1
+        
+        if new_rows:
+            day_total = sum(summa for _, summa in new_rows)
+            self.day_totals[day] = day_total
+            self.weekday_sums[weekday] += day_total
+            self.weekday_days[weekday] += 1
+            heapq.heappush(self.max_heap, (-day_total, day))
+        
+        if len(self.max_heap) > 2 * len(self.day_totals) + 16:
+            self.max_heap = [(-total, day) for day, total in self.day_totals.items()]
+            heapq.heapify(self.max_heap)
+
+    def max_day(self):
+        heap = self.max_heap
+        while heap and self.day_totals.get(heap[0][1]) != -heap[0][0]:
+            heapq.heappop(heap)
+        if not heap:
+            return None, 0.0
+        return dt.date.fromordinal(heap[0][1]), -heap[0][0]
+
+    def weekday_averages(self):
+        return {weekday: self.weekday_sums[weekday] / days
+                for weekday, days in enumerate(self.weekday_days) if days}
+
+    def snapshot(self):
+        return self.make_snapshot(self.budget_map, self.total, self.count, self.item_totals,
+                                  self.max_day(), self.weekday_averages())
+
+    @classmethod
+    def recompute(cls, budget_map, store):
+        total = 0.0
+        count = 0
+        item_totals = collections.defaultdict(float)
+        max_day = (None, 0.0)
+        weekday_sums = collections.defaultdict(float)
+        weekday_days = collections.Counter()
+        
+        for date, rows in store.iter_days(budget_map.start_date, budget_map.end_date):
+            for item_name, summa in rows:
+                total += summa
+                count += 1
+                item_totals[item_name] += summa
+            day_total = sum(summa for _, summa in rows)
+            if max_day[0] is None or day_total > max_day[1]:
+                max_day = (date, day_total)
+            weekday_sums[date.weekday()] += day_total
+            weekday_days[date.weekday()] += 1
+        
+        weekday_averages = {weekday: weekday_sums[weekday] / weekday_days[weekday]
+                            for weekday in sorted(weekday_days)}
+        return cls.make_snapshot(budget_map, total, count, item_totals, max_day, weekday_averages)
+
+    @staticmethod
+    def make_snapshot(budget_map, total, count, item_totals, max_day, weekday_averages):
+        item_spent = {item_name: item_totals.get(item_name, 0.0) for item_name in budget_map.item_names()}
+        
+        max_exceed = (None, 0.0)
+        for item_name, spent in item_spent.items():
+            exceed = spent - budget_map.amount(item_name)
+            if exceed > max_exceed[1]:
+                max_exceed = (item_name, exceed)
+        
+        max_weekday = (0, 0.0)
+        if weekday_averages:
+            max_weekday = max(weekday_averages.items(), key=lambda x: x[1])
+        
+        budget_adherence = StatisticsEngine.budget_adherence(budget_map, total)
+        return StatisticsSnapshot(total, count, item_spent, max_day, weekday_averages, max_weekday[0], max_exceed,
+                                  budget_adherence, get_advice(budget_map, item_spent, total, budget_adherence))
+
+    @staticmethod
+    def budget_adherence(budget_map, total_spent):
+        total_budget = budget_map.total_budget
+        if total_budget == 0:
+            return 0.0
+        
+        otklonenie = total_spent - total_budget
+        proccent = (otklonenie / total_budget) * 100
+        if otklonenie > 0:
+            proccent = math.ceil(proccent * 10) / 10
+        else:
+            proccent = math.floor(proccent * 10) / 10
+        
+        return proccent
+
+    @classmethod
+    def compare_snapshots(cls, expected, actual):
+        close = lambda a, b: abs(a - b) <= cls.TOLERANCE
+        mismatches = []
+        
+        if not close(expected.total_spent, actual.total_spent):
+            mismatches.append('total_spent')
+        if expected.spendings_count != actual.spendings_count:
+            mismatches.append('spendings_count')
+        if expected.item_spent.keys() != actual.item_spent.keys() or not all(
+                close(spent, actual.item_spent[item_name]) for item_name, spent in expected.item_spent.items()):
+            mismatches.append('item_spent')
+        if expected.max_day[0] != actual.max_day[0] or not close(expected.max_day[1], actual.max_day[1]):
+            mismatches.append('max_day')
+        if expected.weekday_averages.keys() != actual.weekday_averages.keys() or not all(
+                close(average, actual.weekday_averages[weekday])
+                for weekday, average in expected.weekday_averages.items()):
+            mismatches.append('weekday_averages')
+        elif not close(expected.weekday_averages.get(expected.max_weekday, 0.0),
+                       actual.weekday_averages.get(actual.max_weekday, 0.0)):
+            mismatches.append('max_weekday')
+        if not close(expected.max_exceed[1], actual.max_exceed[1]):
+            mismatches.append('max_exceed')
+        if abs(expected.budget_adherence - actual.budget_adherence) > 0.1 + cls.TOLERANCE:
+            mismatches.append('budget_adherence')
+        
+        return mismatches
+
+
+class SpendingForecaster:
+    MODELS = ('linear', 'ewma')
+    EWMA_SPAN = 7
+
+    def __init__(self, budget_map=None, store=None, model='ewma'):
+        if model not in self.MODELS:
+            raise ValueError(f"Неизвестная модель прогноза: {model}")
+        self.model = model
+        self.alpha = 2 / (self.EWMA_SPAN + 1)
+        self.reset(budget_map, store)
+
+    def reset(self, budget_map=None, store=None):
+        self.budget_map = budget_map
+        self.spent = collections.defaultdict(float)
+        self.ewma = collections.defaultdict(float)
+        self.ewma_day = {}
+        
+        if budget_map and store:
+            for date, rows in store.iter_days(budget_map.start_date, budget_map.end_date):
+                self.update_day(date, (), rows)
+
+    def update_day(self, date, old_rows, new_rows):
+        if self.budget_map is None or not self.budget_map.start_date <= date <= self.budget_map.end_date:
+            return
+        
+        day = date.toordinal()
+        for item_name, summa in old_rows:
+            self.add(item_name, day, -summa)
+        for item_name, summa in new_rows:
+            self.add(item_name, day, summa)
+
+    def add(self, item_name, day, summa):
+        self.spent[item_name] += summa
+        
+        last_day = self.ewma_day.get(item_name, day)
+        if day >= last_day:
+            self.ewma[item_name] = self.ewma[item_name] * (1 - self.alpha) ** (day - last_day) + self.alpha * summa
+            self.ewma_day[item_name] = day
+        else:
+            self.ewma[item_name] += self.alpha * summa * (1 - self.alpha) ** (last_day - day)
+
+    def daily_rate(self, item_name, day):
+        last_day = self.ewma_day.get(item_name)
+        if last_day is None:
+            return 0.0
+        return self.ewma[item_name] * (1 - self.alpha) ** max(day - last_day, 0)
+
+    def forecast(self, as_of=None):
+        if not self.budget_map:
+            return {}
+        
+        start_date = self.budget_map.start_date
+        end_date = self.budget_map.end_date
+        as_of = min(max(as_of or dt.date.today(), start_date), end_date)
+        elapsed = (as_of - start_date).days + 1
+        remaining = (end_date - as_of).days
+        
+        forecasts = {}
+        for item_name, item_amount in self.budget_map.index.items():
+            spent = self.spent.get(item_name, 0.0)
+            linear = spent + spent / elapsed * remaining
+            ewma = spent + self.daily_rate(item_name, as_of.toordinal()) * remaining
+            projected = linear if self.model == 'linear' else ewma
+            forecasts[item_name] = ItemForecast(spent, item_amount, linear, ewma, projected,
+                                                projected > item_amount + 0.01)
+        return forecasts
+
+
+def get_advice(budget_map, item_spent, total_spent, budget_adherence):
+    total_budget = budget_map.total_budget
+    
+    exceeded_items = []
+    for item_name, spent in item_spent.items():
+        item_budget = budget_map.amount(item_name)
+        if spent > item_budget:
+            exceeded_items.append(item_name)
+    
+    if total_spent == 0:
+        return Advice("Да вы, батюшка, аскет!", 'excellent')
+    
+    if budget_adherence > 500:
+        return Advice("0_0", 'alarm')
+    
+    all_items_count = len(budget_map.items)
+    
+    if total_spent <= total_budget and not exceeded_items:
+        return Advice("Вы огромный молодец и справились с поставленной задачей. Так держать!", 'excellent')
+    elif total_spent <= total_budget and exceeded_items:
+        items_str = ", ".join(exceeded_items)
+        return Advice(f"Неплохо, но вам следует поработать над вашим распределением доходов по следующим пунктам: {items_str}.", 'attention')
+    elif total_spent > total_budget and exceeded_items:
+        items_str = ", ".join(exceeded_items)
+        return Advice(f"Вам следует поработать над вашим распределением доходов по следующим пунктам: {items_str}.", 'warning')
+    elif len(exceeded_items) == all_items_count:
+        return Advice("Просто ужасная работа с распределением доходов! Вам следует лучше следить куда вы тратите заработанное!", 'alarm')
+    else:
+        return Advice("Проанализируйте ваши траты и попробуйте оптимизировать бюджет.", 'neutral')
+
+
+def check_statistics_engine(histories=200, steps=150, days=45, items_count=6, seed=None):
+    import random
+    
+    rng = random.Random(seed)
+    failures = []
+    
+    for history in range(histories):
+        start_date = dt.date(2024, 1, 1) + dt.timedelta(days=rng.randrange(365))
+        item_names = [f'Пункт {i}' for i in range(items_count)]
+        budget_items = [(item_name, float(rng.randrange(100, 2000))) for item_name in item_names[:-1]]
+        budget_map = BudgetMap(budget_items, sum(amount for _, amount in budget_items),
+                               start_date, start_date + dt.timedelta(days=rng.randrange(1, days)), 0)
+        
+        store = SpendingStore()
+        engine = StatisticsEngine(budget_map, store)
+        for step in range(steps):
+            date = start_date + dt.timedelta(days=rng.randrange(-5, days + 5))
+            spendings = [Spending(rng.choice(item_names), rng.randrange(1, 2000) / 4)
+                         for _ in range(rng.choice((0, 0, 1, 2, 3, 5)))]
+            old_spendings = store.set_day(date, spendings)
+            engine.update_day(date, old_spendings, spendings)
+            
+            expected = StatisticsEngine.recompute(budget_map, store)
+            for name, actual in (('incremental', engine.snapshot()),
+                                 ('rebuilt', StatisticsEngine(budget_map, store).snapshot())):
+                mismatches = StatisticsEngine.compare_snapshots(expected, actual)
+                if mismatches:
+                    failures.append((history, step, name, mismatches))
+                    break
+            else:
+                continue
+            break
+    
+    return failures
@@ -0,0 +1,957 @@
+import collections
+import contextlib
+import csv
+import datetime as dt
+import io
+import itertools
+import operator
+import os
+import sqlite3
+import tempfile
+import threading
+
+from .models import BudgetMap, BudgetPeriod, ItemComparison, PeriodComparison
+
+
+class DatabaseManager:
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -16000),
+        ('mmap_size', 64 * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    )
+    CACHED_STATEMENTS = 256
+    JULIAN_DAY_OFFSET = 1721424.5
+    SPENDINGS_CHUNK = 512
+
+    def __init__(self, db_path='budget_data.db'):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.item_ids = {}
+        self.conn = self.open_connection()
+        self.init_database()
+
+    def open_connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=self.CACHED_STATEMENTS)
+        for name, value in self.PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.lock:
+            if self.conn is None:
+                self.conn = self.open_connection()
+            yield self.conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+            except BaseException:
+                conn.rollback()
+                self.item_ids.clear()
+                raise
+            conn.commit()
+
+    def close(self):
+        with self.lock:
+            if self.conn is None:
+                return
+            try:
+                self.conn.execute('PRAGMA optimize')
+            except sqlite3.Error as e:
+                print(f"Ошибка при оптимизации БД: {e}")
+            self.conn.close()
+            self.conn = None
+            print("Соединение с БД закрыто")
+    
+    ROLLUP_REBUILD_V4 = (
+        'DELETE FROM daily_totals',
+        '''
+            INSERT INTO daily_totals (day, total, spendings_count)
+            SELECT day, SUM(amount), COUNT(*) FROM spendings GROUP BY day
+        ''',
+        'DELETE FROM item_totals',
+        '''
+            INSERT INTO item_totals (budget_map_id, item_id, total)
+            SELECT m.id, s.item_id, SUM(s.amount)
+            FROM budget_maps m
+            JOIN spendings s ON s.day BETWEEN m.start_day AND m.end_day
+            GROUP BY m.id, s.item_id
+        ''',
+    )
+
+    ROLLUP_REBUILD_V5 = (
+        'DELETE FROM daily_totals',
+        '''
+            INSERT INTO daily_totals (day, total, spendings_count)
+            SELECT day, SUM(amount), COUNT(*) FROM spendings GROUP BY day
+        ''',
+        'DELETE FROM item_totals',
+        '''
+            INSERT INTO item_totals (budget_map_id, item_id, total)
+            SELECT budget_map_id, item_id, SUM(amount)
+            FROM spendings
+            WHERE budget_map_id IS NOT NULL
+            GROUP BY budget_map_id, item_id
+        ''',
+    )
+
+    ROLLUP_REBUILD = (
+        'DELETE FROM item_totals',
+        '''
+            INSERT INTO item_totals (budget_map_id, item_id, total)
+            SELECT budget_map_id, item_id, SUM(amount)
+            FROM spendings
+            WHERE budget_map_id IS NOT NULL
+            GROUP BY budget_map_id, item_id
+        ''',
+    )
+
+    ROLLUP_CHECKS = (
+        ('item_totals', 2, '''
+            SELECT budget_map_id, item_id, SUM(amount)
+            FROM spendings
+            WHERE budget_map_id IS NOT NULL
+            GROUP BY budget_map_id, item_id
+        ''', '''
+            SELECT budget_map_id, item_id, total FROM item_totals WHERE abs(total) > 0.005
+        '''),
+    )
+    ROLLUP_TOLERANCE = 0.005
+
+    MIGRATIONS = (
+        (1, (
+            '''
+                CREATE TABLE IF NOT EXISTS budget_maps (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    total_budget REAL NOT NULL,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    initial_balance REAL NOT NULL,
+                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS budget_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    budget_map_id INTEGER NOT NULL,
+                    item_name TEXT NOT NULL,
+                    item_amount REAL NOT NULL,
+                    FOREIGN KEY (budget_map_id) REFERENCES budget_maps (id)
+                )
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS daily_spendings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    item_name TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+        )),
+        (2, (
+            'CREATE INDEX IF NOT EXISTS idx_daily_spendings_date ON daily_spendings (date)',
+            'CREATE INDEX IF NOT EXISTS idx_daily_spendings_item_date ON daily_spendings (item_name, date)',
+            'CREATE INDEX IF NOT EXISTS idx_budget_items_map ON budget_items (budget_map_id)',
+            'CREATE INDEX IF NOT EXISTS idx_budget_maps_created ON budget_maps (created_date)',
+        )),
+        (3, (
+            '''
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                )
+            ''',
+            '''
+                CREATE TABLE spendings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    day INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    amount REAL NOT NULL,
+                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (item_id) REFERENCES items (id)
+                )
+            ''',
+            'INSERT OR IGNORE INTO items (name) SELECT DISTINCT item_name FROM daily_spendings',
+            f'''
+                INSERT INTO spendings (id, day, item_id, amount, created_date)
+                SELECT s.id, CAST(julianday(s.date) - {JULIAN_DAY_OFFSET} AS INTEGER),
+                       i.id, s.amount, s.created_date
+                FROM daily_spendings s
+                JOIN items i ON i.name = s.item_name
+                ORDER BY s.id
+            ''',
+            'DROP TABLE daily_spendings',
+            'CREATE INDEX idx_spendings_day ON spendings (day)',
+            'CREATE INDEX idx_spendings_item_day ON spendings (item_id, day)',
+            f'''
+                CREATE VIEW daily_spendings AS
+                SELECT s.id, date(s.day + {JULIAN_DAY_OFFSET}) AS date,
+                       i.name AS item_name, s.amount, s.created_date
+                FROM spendings s
+                JOIN items i ON i.id = s.item_id
+            ''',
+            'ALTER TABLE budget_maps ADD COLUMN start_day INTEGER',
+            'ALTER TABLE budget_maps ADD COLUMN end_day INTEGER',
+            f'''
+                UPDATE budget_maps
+                SET start_day = CAST(julianday(start_date) - {JULIAN_DAY_OFFSET} AS INTEGER),
+                    end_day = CAST(julianday(end_date) - {JULIAN_DAY_OFFSET} AS INTEGER)
+            ''',
+        )),
+        (4, (
+            '''
+                CREATE TABLE daily_totals (
+                    day INTEGER PRIMARY KEY,
+                    total REAL NOT NULL,
+                    spendings_count INTEGER NOT NULL
+                )
+            ''',
+            '''
+                CREATE TABLE item_totals (
+                    budget_map_id INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    total REAL NOT NULL,
+                    PRIMARY KEY (budget_map_id, item_id)
+                ) WITHOUT ROWID
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_insert AFTER INSERT ON spendings
+                BEGIN
+                    INSERT INTO daily_totals (day, total, spendings_count)
+                    VALUES (NEW.day, NEW.amount, 1)
+                    ON CONFLICT (day) DO UPDATE SET
+                        total = total + excluded.total,
+                        spendings_count = spendings_count + 1;
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    SELECT id, NEW.item_id, NEW.amount FROM budget_maps
+                    WHERE NEW.day BETWEEN start_day AND end_day
+                    ON CONFLICT (budget_map_id, item_id) DO UPDATE SET
+                        total = total + excluded.total;
+                END
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_delete AFTER DELETE ON spendings
+                BEGIN
+                    UPDATE daily_totals SET
+                        total = total - OLD.amount,
+                        spendings_count = spendings_count - 1
+                    WHERE day = OLD.day;
+                    DELETE FROM daily_totals WHERE day = OLD.day AND spendings_count <= 0;
+                    UPDATE item_totals SET total = total - OLD.amount
+                    WHERE item_id = OLD.item_id AND budget_map_id IN (
+                        SELECT id FROM budget_maps WHERE OLD.day BETWEEN start_day AND end_day
+                    );
+                END
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_update AFTER UPDATE OF day, item_id, amount ON spendings
+                BEGIN
+                    UPDATE daily_totals SET
+                        total = total - OLD.amount,
+                        spendings_count = spendings_count - 1
+                    WHERE day = OLD.day;
+                    DELETE FROM daily_totals WHERE day = OLD.day AND spendings_count <= 0;
+                    UPDATE item_totals SET total = total - OLD.amount
+                    WHERE item_id = OLD.item_id AND budget_map_id IN (
+                        SELECT id FROM budget_maps WHERE OLD.day BETWEEN start_day AND end_day
+                    );
+                    INSERT INTO daily_totals (day, total, spendings_count)
+                    VALUES (NEW.day, NEW.amount, 1)
+                    ON CONFLICT (day) DO UPDATE SET
+                        total = total + excluded.total,
+                        spendings_count = spendings_count + 1;
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    SELECT id, NEW.item_id, NEW.amount FROM budget_maps
+                    WHERE NEW.day BETWEEN start_day AND end_day
+                    ON CONFLICT (budget_map_id, item_id) DO UPDATE SET
+                        total = total + excluded.total;
+                END
+            ''',
+            '''
+                CREATE TRIGGER budget_maps_rollup_insert AFTER INSERT ON budget_maps
+                BEGIN
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    SELECT NEW.id, item_id, SUM(amount) FROM spendings
+                    WHERE day BETWEEN NEW.start_day AND NEW.end_day
+                    GROUP BY item_id;
+                END
+            ''',
+            '''
+                CREATE TRIGGER budget_maps_rollup_delete AFTER DELETE ON budget_maps
+                BEGIN
+                    DELETE FROM item_totals WHERE budget_map_id = OLD.id;
+                END
+            ''',
+            *ROLLUP_REBUILD_V4,
+        )),
+        (5, (
+            'ALTER TABLE spendings ADD COLUMN budget_map_id INTEGER REFERENCES budget_maps (id)',
+            'ALTER TABLE budget_maps ADD COLUMN closed_date TIMESTAMP',
+            '''
+                UPDATE spendings SET budget_map_id = (
+                    SELECT m.id FROM budget_maps m
+                    WHERE spendings.day BETWEEN m.start_day AND m.end_day
+                    ORDER BY m.created_date DESC, m.id DESC LIMIT 1
+                )
+            ''',
+            '''
+                UPDATE spendings SET budget_map_id = (
+                    SELECT id FROM budget_maps ORDER BY created_date DESC, id DESC LIMIT 1
+                )
+                WHERE budget_map_id IS NULL
+            ''',
+            '''
+                UPDATE budget_maps SET closed_date = CURRENT_TIMESTAMP
+                WHERE id <> (SELECT id FROM budget_maps ORDER BY created_date DESC, id DESC LIMIT 1)
+            ''',
+            'CREATE INDEX idx_spendings_map_day ON spendings (budget_map_id, day)',
+            'CREATE INDEX idx_budget_maps_start ON budget_maps (start_day)',
+            'DROP TRIGGER spendings_rollup_insert',
+            'DROP TRIGGER spendings_rollup_delete',
+            'DROP TRIGGER spendings_rollup_update',
+            'DROP TRIGGER budget_maps_rollup_insert',
+            '''
+                CREATE TRIGGER spendings_rollup_insert AFTER INSERT ON spendings
+                BEGIN
+                    INSERT INTO daily_totals (day, total, spendings_count)
+                    VALUES (NEW.day, NEW.amount, 1)
+                    ON CONFLICT (day) DO UPDATE SET
+                        total = total + excluded.total,
+                        spendings_count = spendings_count + 1;
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    SELECT NEW.budget_map_id, NEW.item_id, NEW.amount
+                    WHERE NEW.budget_map_id IS NOT NULL
+                    ON CONFLICT (budget_map_id, item_id) DO UPDATE SET
+                        total = total + excluded.total;
+                END
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_delete AFTER DELETE ON spendings
+                BEGIN
+                    UPDATE daily_totals SET
+                        total = total - OLD.amount,
+                        spendings_count = spendings_count - 1
+                    WHERE day = OLD.day;
+                    DELETE FROM daily_totals WHERE day = OLD.day AND spendings_count <= 0;
+                    UPDATE item_totals SET total = total - OLD.amount
+                    WHERE budget_map_id = OLD.budget_map_id AND item_id = OLD.item_id;
+                END
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_update
+                AFTER UPDATE OF day, item_id, amount, budget_map_id ON spendings
+                BEGIN
+                    UPDATE daily_totals SET
+                        total = total - OLD.amount,
+                        spendings_count = spendings_count - 1
+                    WHERE day = OLD.day;
+                    DELETE FROM daily_totals WHERE day = OLD.day AND spendings_count <= 0;
+                    UPDATE item_totals SET total = total - OLD.amount
+                    WHERE budget_map_id = OLD.budget_map_id AND item_id = OLD.item_id;
+                    INSERT INTO daily_totals (day, total, spendings_count)
+                    VALUES (NEW.day, NEW.amount, 1)
+                    ON CONFLICT (day) DO UPDATE SET
+                        total = total + excluded.total,
+                        spendings_count = spendings_count + 1;
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    SELECT NEW.budget_map_id, NEW.item_id, NEW.amount
+                    WHERE NEW.budget_map_id IS NOT NULL
+                    ON CONFLICT (budget_map_id, item_id) DO UPDATE SET
+                        total = total + excluded.total;
+                END
+            ''',
+            *ROLLUP_REBUILD_V5,
+        )),
+        (6, (
+            'DROP TRIGGER spendings_rollup_insert',
+            'DROP TRIGGER spendings_rollup_delete',
+            'DROP TRIGGER spendings_rollup_update',
+            'DROP TABLE daily_totals',
+            '''
+                CREATE TRIGGER spendings_rollup_insert AFTER INSERT ON spendings
+                WHEN NEW.budget_map_id IS NOT NULL
+                BEGIN
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    VALUES (NEW.budget_map_id, NEW.item_id, NEW.amount)
+                    ON CONFLICT (budget_map_id, item_id) DO UPDATE SET
+                        total = total + excluded.total;
+                END
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_delete AFTER DELETE ON spendings
+                WHEN OLD.budget_map_id IS NOT NULL
+                BEGIN
+                    UPDATE item_totals SET total = total - OLD.amount
+                    WHERE budget_map_id = OLD.budget_map_id AND item_id = OLD.item_id;
+                END
+            ''',
+            '''
+                CREATE TRIGGER spendings_rollup_update
+                AFTER UPDATE OF item_id, amount, budget_map_id ON spendings
+                BEGIN
+                    UPDATE item_totals SET total = total - OLD.amount
+                    WHERE budget_map_id = OLD.budget_map_id AND item_id = OLD.item_id;
+                    INSERT INTO item_totals (budget_map_id, item_id, total)
+                    SELECT NEW.budget_map_id, NEW.item_id, NEW.amount
+                    WHERE NEW.budget_map_id IS NOT NULL
+                    ON CONFLICT (budget_map_id, item_id) DO UPDATE SET
+                        total = total + excluded.total;
+                END
+            ''',
+        )),
+    )
+
+    DAY_ROWS_QUERY = '''
+        SELECT id, item_id, amount
+        FROM spendings
+        WHERE budget_map_id IS ? AND day = ?
+        ORDER BY id
+    '''
+    ACTIVE_BUDGET_MAP_QUERY = '''
+        SELECT id FROM budget_maps
+        WHERE closed_date IS NULL
+        ORDER BY created_date DESC, id DESC LIMIT 1
+    '''
+    BUDGET_MAPS_QUERY = '''
+        SELECT id, start_day, end_day, total_budget, closed_date
+        FROM budget_maps
+        ORDER BY start_day DESC, id DESC
+    '''
+    BUDGET_ITEMS_QUERY = '''
+        SELECT item_name, item_amount 
+        FROM budget_items 
+        WHERE budget_map_id = ?
+        ORDER BY id
+    '''
+
+    def init_database(self):
+        with self.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+        self.run_migrations()
+
+    def get_schema_version(self):
+        with self.connection() as conn:
+            row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+        return row[0] or 0
+
+    def run_migrations(self):
+        with self.connection() as conn:
+            current_version = self.get_schema_version()
+            applied = False
+            for version, statements in self.MIGRATIONS:
+                if version <= current_version:
+                    continue
+                
+                with self.transaction() as cursor:
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute('INSERT INTO schema_version (version) VALUES (?)', (version,))
+                applied = True
+                print(f"БД обновлена до версии схемы {version}")
+            
+            if applied:
+                conn.execute('VACUUM')
+
+    def query_plan_checks(self):
+        start = dt.date(2000, 1, 1)
+        end = dt.date(2000, 12, 31)
+        return (
+            ('get_spendings_by_date_range', *self.spendings_query(start, end), 'idx_spendings_day'),
+            ('save_daily_spendings', self.DAY_ROWS_QUERY, (1, start.toordinal()), 'idx_spendings_map_day'),
+            ('iter_spendings(budget_map_id)', *self.spendings_query(budget_map_id=1), 'idx_spendings_map_day'),
+            ('get_latest_budget_map', self.ACTIVE_BUDGET_MAP_QUERY, (), 'idx_budget_maps_created'),
+            ('get_budget_maps', self.BUDGET_MAPS_QUERY, (), 'idx_budget_maps_start'),
+            ('get_budget_map', self.BUDGET_ITEMS_QUERY, (1,), 'idx_budget_items_map'),
+        )
+
+    def check_query_plans(self):
+        plans = {}
+        failures = []
+        with self.connection() as conn:
+            for name, query, params, index_name in self.query_plan_checks():
+                details = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+                plans[name] = details
+                if not any(index_name in detail for detail in details):
+                    failures.append((name, index_name))
+        return plans, failures
+
+    def check_rollups(self, repair=False):
+        mismatches = []
+        with self.connection() as conn:
+            for name, key_size, raw_query, rollup_query in self.ROLLUP_CHECKS:
+                expected = {row[:key_size]: row[key_size:] for row in conn.execute(raw_query)}
+                actual = {row[:key_size]: row[key_size:] for row in conn.execute(rollup_query)}
+                for key in expected.keys() | actual.keys():
+                    expected_values = expected.get(key, ())
+                    actual_values = actual.get(key, ())
+                    values = itertools.zip_longest(expected_values, actual_values, fillvalue=0)
+                    if any(abs(a - b) > self.ROLLUP_TOLERANCE for a, b in values):
+                        mismatches.append((name, key, expected_values, actual_values))
+        
+        if mismatches and repair:
+            self.rebuild_rollups()
+        return mismatches
+
+    def rebuild_rollups(self):
+        with self.transaction() as cursor:
+            for statement in self.ROLLUP_REBUILD:
+                cursor.execute(statement)
+        print("Сводные таблицы пересчитаны")
+    
+    def get_item_id(self, cursor, item_name):
+        item_id = self.item_ids.get(item_name)
+        if item_id is None:
+            cursor.execute('INSERT OR IGNORE INTO items (name) VALUES (?)', (item_name,))
+            cursor.execute('SELECT id FROM items WHERE name = ?', (item_name,))
+            item_id = cursor.fetchone()[0]
+            self.item_ids[item_name] = item_id
+        return item_id
+    
+    def save_budget_map(self, budget_data):
+        with self.transaction() as cursor:
+            return self.insert_budget_map(cursor, budget_data)
+
+    def insert_budget_map(self, cursor, budget_data):
+        cursor.execute('UPDATE budget_maps SET closed_date = CURRENT_TIMESTAMP WHERE closed_date IS NULL')
+        
+        cursor.execute('''
+            INSERT INTO budget_maps (total_budget, start_date, end_date, initial_balance, start_day, end_day)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            budget_data.total_budget,
+            budget_data.start_date.strftime('%Y-%m-%d'),
+            budget_data.end_date.strftime('%Y-%m-%d'),
+            budget_data.initial_ostatok,
+            budget_data.start_date.toordinal(),
+            budget_data.end_date.toordinal()
+        ))
+        
+        budget_map_id = cursor.lastrowid
+        
+        cursor.executemany('''
+            INSERT INTO budget_items (budget_map_id, item_name, item_amount)
+            VALUES (?, ?, ?)
+        ''', [(budget_map_id, item_name, item_amount)
+              for item_name, item_amount in budget_data.items])
+        
+        return budget_map_id
+
+    def insert_spendings(self, cursor, rows, progress=None, chunk=SPENDINGS_CHUNK, budget_map_id=None):
+        inserted = 0
+        rows = iter(rows)
+        while True:
+            batch = [(date.toordinal(), self.get_item_id(cursor, item_name), float(amount), budget_map_id)
+                     for date, item_name, amount in itertools.islice(rows, chunk)]
+            if not batch:
+                return inserted
+            cursor.executemany('''
+                INSERT INTO spendings (day, item_id, amount, budget_map_id)
+                VALUES (?, ?, ?, ?)
+            ''', batch)
+            inserted += len(batch)
+            if progress:
+                progress(inserted)
+    
+    def get_active_budget_map_id(self, cursor):
+        cursor.execute(self.ACTIVE_BUDGET_MAP_QUERY)
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def get_latest_budget_map(self):
+        with self.connection() as conn:
+            budget_map_id = self.get_active_budget_map_id(conn.cursor())
+            if budget_map_id is None:
+                row = conn.execute('SELECT id FROM budget_maps ORDER BY created_date DESC, id DESC LIMIT 1').fetchone()
+                budget_map_id = row[0] if row else None
+        
+        if budget_map_id is None:
+            return None
+        return self.get_budget_map(budget_map_id)
+
+    def get_budget_map(self, budget_map_id):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, total_budget, start_day, end_day, initial_balance, closed_date
+                FROM budget_maps 
+                WHERE id = ?
+            ''', (budget_map_id,))
+            
+            budget_row = cursor.fetchone()
+            if not budget_row:
+                return None
+            
+            budget_id, total_budget, start_day, end_day, initial_balance, closed_date = budget_row
+            
+            cursor.execute(self.BUDGET_ITEMS_QUERY, (budget_id,))
+            
+            items = cursor.fetchall()
+        
+        return BudgetMap(
+            items,
+            total_budget,
+            dt.date.fromordinal(start_day),
+            dt.date.fromordinal(end_day),
+            initial_balance,
+            id=budget_id,
+            closed=closed_date is not None
+        )
+
+    def get_budget_maps(self):
+        with self.connection() as conn:
+            rows = conn.execute(self.BUDGET_MAPS_QUERY).fetchall()
+        return [BudgetPeriod(budget_map_id, dt.date.fromordinal(start_day), dt.date.fromordinal(end_day),
+                             total_budget, closed_date is not None)
+                for budget_map_id, start_day, end_day, total_budget, closed_date in rows]
+
+    def get_period_comparison(self):
+        with self.connection() as conn:
+            rows = conn.execute('''
+                WITH period_totals AS (
+                    SELECT m.id, m.start_day, m.end_day, m.total_budget,
+                           m.closed_date IS NOT NULL AS closed,
+                           (SELECT TOTAL(t.total) FROM item_totals t WHERE t.budget_map_id = m.id) AS spent,
+                           m.end_day - m.start_day + 1 AS days
+                    FROM budget_maps m
+                )
+                SELECT id, start_day, end_day, total_budget, spent,
+                       spent / days AS per_day,
+                       spent - LAG(spent) OVER periods AS spent_change,
+                       spent / days - LAG(spent / days) OVER periods AS per_day_change,
+                       AVG(spent / days) OVER (periods ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) AS per_day_average,
+                       RANK() OVER (ORDER BY spent / days DESC) AS per_day_rank,
+                       closed
+                FROM period_totals
+                WINDOW periods AS (ORDER BY start_day, id)
+                ORDER BY start_day, id
+            ''').fetchall()
+        return [PeriodComparison(budget_map_id, dt.date.fromordinal(start_day), dt.date.fromordinal(end_day),
+                                 *values, bool(closed))
+                for budget_map_id, start_day, end_day, *values, closed in rows]
+
+    def get_item_period_comparison(self):
+        items = collections.defaultdict(list)
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT b.budget_map_id, b.item_name, b.item_amount,
+                       COALESCE(t.total, 0.0) AS spent,
+                       COALESCE(t.total, 0.0) - LAG(COALESCE(t.total, 0.0)) OVER (
+                           PARTITION BY b.item_name ORDER BY m.start_day, m.id
+                       ) AS spent_change
+                FROM budget_items b
+                JOIN budget_maps m ON m.id = b.budget_map_id
+                LEFT JOIN items i ON i.name = b.item_name
+                LEFT JOIN item_totals t ON t.budget_map_id = b.budget_map_id AND t.item_id = i.id
+                ORDER BY m.start_day, m.id, b.id
+            ''').fetchall()
+        for budget_map_id, *values in rows:
+            items[budget_map_id].append(ItemComparison(*values))
+        return dict(items)
+    
+    def save_daily_spendings(self, date, spendings, budget_map_id=None):
+        day = date.toordinal()
+        
+        with self.transaction() as cursor:
+            new_rows = [(self.get_item_id(cursor, item_name), float(summa))
+                        for item_name, summa in spendings]
+            
+            cursor.execute(self.DAY_ROWS_QUERY, (budget_map_id, day))
+            old_rows = cursor.fetchall()
+            
+            updates, inserts, deletes = self.diff_day_rows(old_rows, new_rows)
+            
+            if deletes:
+                cursor.executemany('DELETE FROM spendings WHERE id = ?', deletes)
+            if updates:
+                cursor.executemany('''
+                    UPDATE spendings SET item_id = ?, amount = ?
+                    WHERE id = ?
+                ''', updates)
+            if inserts:
+                cursor.executemany('''
+                    INSERT INTO spendings (day, item_id, amount, budget_map_id)
+                    VALUES (?, ?, ?, ?)
+                ''', [(day, item_id, amount, budget_map_id) for item_id, amount in inserts])
+        
+        print(f"Сохранено {len(spendings)} трат за {date.strftime('%Y-%m-%d')} "
+              f"(добавлено: {len(inserts)}, изменено: {len(updates)}, удалено: {len(deletes)})")
+
+    @staticmethod
+    def diff_day_rows(old_rows, new_rows):
+        updates = []
+        for (row_id, old_item, old_amount), (new_item, new_amount) in zip(old_rows, new_rows):
+            if old_item != new_item or old_amount != new_amount:
+                updates.append((new_item, new_amount, row_id))
+        
+        inserts = new_rows[len(old_rows):]
+        deletes = [(row[0],) for row in old_rows[len(new_rows):]]
+        return updates, inserts, deletes
+    
+    def has_spendings(self):
+        with self.connection() as conn:
+            return conn.execute('SELECT EXISTS (SELECT 1 FROM spendings)').fetchone()[0] == 1
+    
+    def get_spendings_by_date_range(self, start_date, end_date):
+        return list(self.iter_spendings(start_date, end_date))
+
+    @staticmethod
+    def day_range_conditions(start, end, column='s.day'):
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append(f'{column} >= ?')
+            params.append(start.toordinal())
+        if end is not None:
+            conditions.append(f'{column} <= ?')
+            params.append(end.toordinal())
+        return conditions, params
+
+    def spendings_query(self, start=None, end=None, items=None, budget_map_id=None):
+        conditions, params = self.day_range_conditions(start, end)
+        if budget_map_id is not None:
+            conditions.append('s.budget_map_id = ?')
+            params.append(budget_map_id)
+        if items is not None:
+            items = list(items)
+            if not items:
+                return None
+            conditions.append(f"i.name IN ({', '.join('?' * len(items))})")
+            params.extend(items)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        return f'''
+            SELECT s.day, i.name, s.amount
+            FROM spendings s
+            JOIN items i ON i.id = s.item_id
+            {where}
+            ORDER BY s.day, s.id
+        ''', params
+
+    def iter_spendings(self, start=None, end=None, items=None, chunk=SPENDINGS_CHUNK, budget_map_id=None):
+        query = self.spendings_query(start, end, items, budget_map_id)
+        if query is None:
+            return
+        
+        with self.connection() as conn:
+            cursor = conn.execute(*query)
+        
+        try:
+            while True:
+                with self.connection():
+                    rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                for day, item_name, amount in rows:
+                    yield dt.date.fromordinal(day), item_name, amount
+        finally:
+            cursor.close()
+
+    def iter_days(self, start=None, end=None, items=None, chunk=SPENDINGS_CHUNK, budget_map_id=None):
+        rows = self.iter_spendings(start, end, items, chunk, budget_map_id)
+        for date, day_rows in itertools.groupby(rows, key=operator.itemgetter(0)):
+            yield date, [(item_name, amount) for _, item_name, amount in day_rows]
+
+
+class ConnectPerCallDatabaseManager(DatabaseManager):
+    def __init__(self, db_path='budget_data.db'):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.item_ids = {}
+        self.conn = None
+        self.init_database()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def iter_spendings(self, start=None, end=None, items=None, chunk=None, budget_map_id=None):
+        query = self.spendings_query(start, end, items, budget_map_id)
+        if query is None:
+            return
+        
+        with self.connection() as conn:
+            rows = conn.execute(*query).fetchall()
+        for day, item_name, amount in rows:
+            yield dt.date.fromordinal(day), item_name, amount
+
+    def close(self):
+        pass
+
+
+def atomic_write_csv(path, rows):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+class SpendingsJournal:
+    HEADER = ('date', 'item_name', 'summa')
+    COMPACT_EVERY = 50
+
+    def __init__(self, snapshot_path='daily_spendings.csv', journal_path='daily_spendings.journal.csv'):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.damaged = False
+        entries = list(self.read_journal())
+        self.entries = len(entries)
+        if self.damaged:
+            self.rewrite_journal(entries)
+
+    def rewrite_journal(self, entries):
+        rows = []
+        for date, day_rows in entries:
+            rows.append(['set', date.strftime('%Y-%m-%d'), len(day_rows)])
+            rows.extend(['row', item_name, summa] for item_name, summa in day_rows)
+        atomic_write_csv(self.journal_path, rows)
+        self.damaged = False
+
+    def append_day(self, date, spendings):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['set', date.strftime('%Y-%m-%d'), len(spendings)])
+        writer.writerows(['row', item_name, summa] for item_name, summa in spendings)
+        
+        with open(self.journal_path, 'a', newline='', encoding='utf-8') as file:
+            file.write(buffer.getvalue())
+            file.flush()
+            os.fsync(file.fileno())
+        self.entries += 1
+
+    def needs_compaction(self):
+        return self.entries >= self.COMPACT_EVERY
+
+    def compact(self, spendings):
+        rows = ((date.strftime('%Y-%m-%d'), item_name, summa) for date, item_name, summa in spendings)
+        atomic_write_csv(self.snapshot_path, itertools.chain([self.HEADER], rows))
+        atomic_write_csv(self.journal_path, [])
+        self.entries = 0
+
+    def clear(self):
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.entries = 0
+
+    def exists(self):
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        with open(self.snapshot_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                if row:
+                    yield dt.date.fromisoformat(row[0]), row[1], float(row[2])
+
+    def read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            try:
+                for row in reader:
+                    if not row:
+                        continue
+                    if row[0] != 'set':
+                        raise ValueError(f"Неожиданная строка журнала: {row}")
+                    date = dt.date.fromisoformat(row[1])
+                    rows = []
+                    for _ in range(int(row[2])):
+                        item_row = next(reader)
+                        if item_row[0] != 'row':
+                            raise ValueError(f"Неожиданная строка журнала: {item_row}")
+                        rows.append((item_row[1], float(item_row[2])))
+                    yield date, rows
+            except (ValueError, IndexError, StopIteration, csv.Error) as e:
+                self.damaged = True
+                print(f"Журнал трат обрезан, остаток пропущен: {e}")
+
+
+class CsvImporter:
+    def __init__(self, db_manager, progress=None):
+        self.db_manager = db_manager
+        self.progress = progress
+        self.imported = 0
+
+    def report(self, count):
+        self.imported = count
+        if self.progress:
+            self.progress(count)
+
+    def read_budget_map(self, path='budget_map.csv'):
+        if not os.path.exists(path):
+            return None
+            
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            
+            next(reader)
+            
+            main_data = next(reader)
+            if not main_data:
+                return None
+            
+            total_budget = float(main_data[0])
+            start_date = dt.date.fromisoformat(main_data[1])
+            end_date = dt.date.fromisoformat(main_data[2])
+            initial_ostatok = float(main_data[3])
+            
+            next(reader)
+            next(reader)
+            next(reader)
+            
+            budget_items = [(row[0], float(row[1])) for row in reader if row]
+        
+        return BudgetMap(budget_items, total_budget, start_date, end_date, initial_ostatok)
+
+    def import_csv(self, budget_map_path=None, journal=None):
+        budget_map_data = self.read_budget_map(budget_map_path) if budget_map_path else None
+        
+        with self.db_manager.transaction() as cursor:
+            if budget_map_data:
+                budget_map_data.id = self.db_manager.insert_budget_map(cursor, budget_map_data)
+            
+            if journal:
+                budget_map_id = self.db_manager.get_active_budget_map_id(cursor)
+                count = self.db_manager.insert_spendings(cursor, journal.read_snapshot(), self.report,
+                                                         budget_map_id=budget_map_id)
+                
+                for date, rows in journal.read_journal():
+                    cursor.execute('DELETE FROM spendings WHERE budget_map_id IS ? AND day = ?',
+                                   (budget_map_id, date.toordinal()))
+                    day_rows = ((date, item_name, summa) for item_name, summa in rows)
+                    count += self.db_manager.insert_spendings(cursor, day_rows, budget_map_id=budget_map_id)
+                    self.report(count)
+        
+        return budget_map_data
@@ -0,0 +1,159 @@
+import bisect
+import collections
+import datetime as dt
+import itertools
+import math
+import operator
+from array import array
+
+from .models import Spending
+
+
+class SpendingSlice:
+    __slots__ = ('store', 'days', 'item_ids', 'amounts')
+
+    def __init__(self, store, lo, hi):
+        self.store = store
+        self.days = store.days[lo:hi]
+        self.item_ids = store.item_ids[lo:hi]
+        self.amounts = store.amounts[lo:hi]
+
+    def __len__(self):
+        return len(self.days)
+
+    def rows(self):
+        item_names = self.store.item_names
+        for day, item_id, amount in zip(self.days, self.item_ids, self.amounts):
+            yield dt.date.fromordinal(day), item_names[item_id], amount
+
+    def total(self):
+        return math.fsum(self.amounts)
+
+    def day_totals(self):
+        totals = {}
+        for day, amount in zip(self.days, self.amounts):
+            totals[day] = totals.get(day, 0.0) + amount
+        return {dt.date.fromordinal(day): total for day, total in totals.items()}
+
+    def item_totals(self):
+        totals = collections.defaultdict(float)
+        for item_id, amount in zip(self.item_ids, self.amounts):
+            totals[item_id] += amount
+        item_names = self.store.item_names
+        return {item_names[item_id]: total for item_id, total in totals.items()}
+
+
+class SpendingStore:
+    def __init__(self):
+        self.days = array('i')
+        self.item_ids = array('i')
+        self.amounts = array('d')
+        self.item_names = []
+        self.item_index = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        store = cls()
+        ordered = True
+        for date, item_name, amount in rows:
+            day = date.toordinal()
+            if store.days and day < store.days[-1]:
+                ordered = False
+            store.days.append(day)
+            store.item_ids.append(store.item_id(item_name))
+            store.amounts.append(amount)
+        
+        if not ordered:
+            store.sort()
+        return store
+
+    @classmethod
+    def merge(cls, stores):
+        store = cls()
+        ordered = True
+        for source in stores:
+            if not source:
+                continue
+            if store.days and source.days[0] < store.days[-1]:
+                ordered = False
+            item_ids = array('i', (store.item_id(item_name) for item_name in source.item_names))
+            store.days.extend(source.days)
+            store.item_ids.extend(item_ids[item_id] for item_id in source.item_ids)
+            store.amounts.extend(source.amounts)
+        
+        if not ordered:
+            store.sort()
+        return store
+
+    def sort(self):
+        order = sorted(range(len(self.days)), key=self.days.__getitem__)
+        self.days = array('i', (self.days[i] for i in order))
+        self.item_ids = array('i', (self.item_ids[i] for i in order))
+        self.amounts = array('d', (self.amounts[i] for i in order))
+
+    def __len__(self):
+        return len(self.days)
+
+    def __contains__(self, date):
+        lo, hi = self.bounds(date, date)
+        return lo < hi
+
+    def item_id(self, item_name):
+        item_id = self.item_index.get(item_name)
+        if item_id is None:
+            item_id = len(self.item_names)
+            self.item_names.append(item_name)
+            self.item_index[item_name] = item_id
+        return item_id
+
+    def bounds(self, start=None, end=None):
+        lo = 0 if start is None else bisect.bisect_left(self.days, start.toordinal())
+        hi = len(self.days) if end is None else bisect.bisect_right(self.days, end.toordinal())
+        return lo, max(lo, hi)
+
+    def day(self, date):
+        lo, hi = self.bounds(date, date)
+        item_names = self.item_names
+        return tuple(Spending(item_names[self.item_ids[i]], self.amounts[i]) for i in range(lo, hi))
+
+    def set_day(self, date, spendings):
+        lo, hi = self.bounds(date, date)
+        old_rows = self.day(date)
+        self.days[lo:hi] = array('i', [date.toordinal()] * len(spendings))
+        self.item_ids[lo:hi] = array('i', [self.item_id(item_name) for item_name, _ in spendings])
+        self.amounts[lo:hi] = array('d', [float(summa) for _, summa in spendings])
+        return old_rows
+
+    def range(self, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return SpendingSlice(self, lo, hi)
+
+    def iter_days(self, start=None, end=None):
+        rows = self.range(start, end).rows()
+        for date, day_rows in itertools.groupby(rows, key=operator.itemgetter(0)):
+            yield date, tuple(Spending(item_name, amount) for _, item_name, amount in day_rows)
+
+    def view(self):
+        return SpendingStoreView(self)
+
+
+class SpendingStoreView:
+    __slots__ = ('_store',)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, date):
+        return date in self._store
+
+    def day(self, date):
+        return self._store.day(date)
+
+    def range(self, start=None, end=None):
+        return self._store.range(start, end)
+
+    def iter_days(self, start=None, end=None):
+        return self._store.iter_days(start, end)